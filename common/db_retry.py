@@ -0,0 +1,129 @@
+# common/db_retry.py
+"""
+Chạy lại cả transaction khi DB bỏ nó vì tranh chấp khoá:
+MySQL 1213 (deadlock, InnoDB đã rollback) / 1205 (lock wait timeout); sqlite "database is locked".
+
+    @action(detail=True, methods=["post"])
+    @retry_on_lock_error
+    @transaction.atomic
+    def cancel(self, request, pk=None): ...
+
+Decorator phải nằm NGOÀI transaction.atomic: lần chạy lại mở transaction mới. Nếu lúc gọi đã ở
+trong 1 atomic khác (admin changeform, ATOMIC_REQUESTS, TestCase) thì chỉ gọi 1 lần - không thể
+chạy lại 1 phần của transaction đã bị rollback. Hàm được bọc phải chạy lại được (không sửa input).
+
+Lock wait timeout (1205) mặc định KHÔNG chạy lại: mỗi lần đã chờ hết innodb_lock_wait_timeout
+(50s mặc định), chạy lại chỉ giữ request lâu thêm. Bật DB_RETRY_LOCK_WAIT kèm DB_LOCK_WAIT_TIMEOUT ngắn.
+
+Backoff: chờ random(0, min(max, base * 2^n)) giữa các lần (full jitter) để các transaction vừa
+đụng nhau không cùng thử lại 1 lúc. Mỗi lần chạy lại / bỏ cuộc: log + gửi signal lock_retry
+(gắn metrics ở receiver), và đếm theo tên trong retry_stats() của process.
+Hết lượt thì lỗi vẫn raise; với API, exception_handler bên dưới (REST_FRAMEWORK["EXCEPTION_HANDLER"])
+đổi nó thành 503 + Retry-After thay vì 500.
+Cấu hình: DB_RETRY_ATTEMPTS, DB_RETRY_BASE_DELAY_MS, DB_RETRY_MAX_DELAY_MS, DB_RETRY_LOCK_WAIT,
+DB_RETRY_AFTER_SECONDS.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.dispatch import Signal
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as drf_exception_handler, set_rollback
+
+logger = logging.getLogger(__name__)
+
+DEADLOCK_CODES = {1213}
+LOCK_WAIT_CODES = {1205}
+
+# kwargs: name, kind ('deadlock'|'lock_wait'), outcome ('retry'|'gave_up'), attempt (lần vừa lỗi, từ 1), exc
+lock_retry = Signal()
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def lock_error_kind(exc):
+    """'deadlock' / 'lock_wait' nếu exc là lỗi tranh chấp khoá (chạy lại được), ngược lại None."""
+    if not isinstance(exc, OperationalError):
+        return None
+    code = exc.args[0] if exc.args else None
+    if code in DEADLOCK_CODES:
+        return "deadlock"
+    if code in LOCK_WAIT_CODES or "database is locked" in str(exc):
+        return "lock_wait"
+    return None
+
+
+def _report(name, kind, outcome, attempt, exc):
+    with _stats_lock:
+        _stats[name, kind, outcome] += 1
+    # receiver lỗi không được làm hỏng request
+    for receiver, result in lock_retry.send_robust(
+        sender=None, name=name, kind=kind, outcome=outcome, attempt=attempt, exc=exc
+    ):
+        if isinstance(result, Exception):
+            logger.error("lock_retry receiver %r lỗi: %r", receiver, result)
+
+
+def retry_stats():
+    """{(tên, 'deadlock'|'lock_wait', 'retry'|'gave_up'): số lần} của process hiện tại."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def run_with_retry(func, *args, name=None, attempts=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Gọi func(*args, **kwargs), chạy lại khi gặp lỗi khoá; hết lượt thì raise lỗi cuối."""
+    name = name or getattr(func, "__qualname__", repr(func))
+    if connections[using].in_atomic_block:
+        return func(*args, **kwargs)
+
+    attempts = attempts or getattr(settings, "DB_RETRY_ATTEMPTS", 3)
+    base = getattr(settings, "DB_RETRY_BASE_DELAY_MS", 10) / 1000
+    cap = getattr(settings, "DB_RETRY_MAX_DELAY_MS", 200) / 1000
+    retry_lock_wait = getattr(settings, "DB_RETRY_LOCK_WAIT", False)
+    for attempt in range(1, attempts + 1):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as exc:
+            kind = lock_error_kind(exc)
+            if kind is None:
+                raise
+            if attempt >= attempts or (kind == "lock_wait" and not retry_lock_wait):
+                _report(name, kind, "gave_up", attempt, exc)
+                logger.warning("%s: %s ở lần %d/%d, bỏ cuộc: %s", name, kind, attempt, attempts, exc)
+                raise
+            _report(name, kind, "retry", attempt, exc)
+            logger.info("%s: %s ở lần %d/%d, chạy lại", name, kind, attempt, attempts)
+            time.sleep(random.uniform(0, min(cap, base * 2 ** (attempt - 1))))
+
+
+def retry_on_lock_error(func=None, *, name=None, attempts=None, using=DEFAULT_DB_ALIAS):
+    """Decorator của run_with_retry; dùng trần (@retry_on_lock_error) hoặc có tham số."""
+    def decorator(f):
+        label = name or f"{f.__module__}.{f.__qualname__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            return run_with_retry(f, *args, name=label, attempts=attempts, using=using, **kwargs)
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+def exception_handler(exc, context):
+    """Handler DRF: lỗi khoá đã hết lượt chạy lại -> 503 + Retry-After (client thử lại được), còn lại như DRF."""
+    if lock_error_kind(exc) is None:
+        return drf_exception_handler(exc, context)
+    set_rollback()
+    response = Response(
+        {"detail": "Hệ thống đang bận, vui lòng thử lại sau."}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response["Retry-After"] = str(getattr(settings, "DB_RETRY_AFTER_SECONDS", 1))
+    return response
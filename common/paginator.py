@@ -0,0 +1,53 @@
+# common/paginator.py
+"""
+Paginator cho admin changelist của bảng lớn: không chạy COUNT(*) chính xác mỗi lần load trang.
+
+- Không filter: lấy số dòng ước lượng từ thống kê bảng (MySQL information_schema.TABLES.TABLE_ROWS);
+  dưới ADMIN_ESTIMATED_COUNT_THRESHOLD thì đếm thật (bảng nhỏ, rẻ và chính xác).
+- Có filter/search, hoặc DB không có thống kê: COUNT thật; kết quả lớn được cache ADMIN_COUNT_CACHE_TTL giây.
+Dùng kèm show_full_result_count = False để admin không đếm thêm lần nữa cho "(N total)".
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_table_rows(model, using="default"):
+    """Số dòng ước lượng theo thống kê của DB, None nếu không có."""
+    conn = connections[using]
+    if conn.vendor != "mysql":
+        return None
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [model._meta.db_table],
+        )
+        row = cur.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        threshold = getattr(settings, "ADMIN_ESTIMATED_COUNT_THRESHOLD", 10_000)
+        if not qs.query.where:
+            estimate = estimated_table_rows(qs.model, qs.db)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+            if estimate is not None:
+                return qs.count()
+
+        sql, params = qs.query.sql_with_params()
+        key = "admin:count:" + hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+        n = cache.get(key)
+        if n is None:
+            n = qs.count()
+            if n >= threshold:  # kết quả nhỏ luôn đếm thật để trang cuối không bị lệch
+                cache.set(key, n, getattr(settings, "ADMIN_COUNT_CACHE_TTL", 60))
+        return n
@@ -0,0 +1,233 @@
+# common/profiling.py
+"""
+Profiler lấy mẫu cho request chậm (bật bằng PROFILER_ENABLED=1).
+
+- 1 thread nền mỗi PROFILER_INTERVAL_MS đọc stack (sys._current_frames) của các thread đang xử lý request.
+- Trong request, mọi câu SQL trên connection default được ghi kèm thời gian (execute_wrapper).
+- Request chậm hơn PROFILER_SLOW_MS (hoặc rơi vào PROFILER_SAMPLE_RATE) được lưu thành file
+  speedscope JSON vào PROFILER_DIR, giữ tối đa PROFILER_MAX_FILES file mới nhất (ring buffer).
+  Kèm mỗi file 1 file <tên>.meta.json nhỏ (metadata không có SQL) để trang list không phải đọc cả profile.
+Tắt thì middleware raise MiddlewareNotUsed lúc khởi động -> không còn trong chain, không tốn gì.
+Staff xem/tải ở /admin/profiles/ (common/profiling_views.py).
+"""
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+PROFILE_NAME_RE = re.compile(r"^\d{13}-[0-9a-f]{8}\.json$")
+MAX_DEPTH = 128
+
+
+def profile_dir() -> Path:
+    return Path(getattr(settings, "PROFILER_DIR", settings.BASE_DIR / "profiles"))
+
+
+# ----------------- Sampler -----------------
+def _stack(frame):
+    """Stack từ gốc tới lá, mỗi frame = (file, function, firstlineno)."""
+    out = []
+    while frame is not None and len(out) < MAX_DEPTH:
+        code = frame.f_code
+        out.append((code.co_filename, code.co_name, code.co_firstlineno))
+        frame = frame.f_back
+    return tuple(reversed(out))
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.active = {}  # thread id -> Counter(stack -> số mẫu)
+        # giữ trong lúc ghi mẫu: untrack() xong thì sampler không còn đụng tới Counter của request đó
+        self.lock = threading.Lock()
+
+    def track(self, tid):
+        with self.lock:
+            self.active[tid] = Counter()
+
+    def untrack(self, tid) -> Counter:
+        """Ngừng lấy mẫu thread `tid`, trả Counter của nó (từ đây chỉ request thread dùng)."""
+        with self.lock:
+            return self.active.pop(tid, None) or Counter()
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self.lock:
+            for tid, samples in self.active.items():
+                frame = frames.get(tid)
+                if frame is not None:
+                    samples[_stack(frame)] += 1
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            if self.active:
+                self.sample()
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def _get_sampler():
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = _Sampler(getattr(settings, "PROFILER_INTERVAL_MS", 5) / 1000)
+                _sampler.start()
+    return _sampler
+
+
+class _SqlRecorder:
+    def __init__(self, limit):
+        self.limit = limit
+        self.queries = []
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total += 1
+            if len(self.queries) < self.limit:
+                self.queries.append({"sql": sql, "ms": round((time.perf_counter() - start) * 1000, 3)})
+
+
+# ----------------- Lưu file (ring buffer) -----------------
+def to_speedscope(samples, interval_ms, meta):
+    frames, index, stacks, weights = [], {}, [], []
+    for stack, count in samples.items():
+        ids = []
+        for fr in stack:
+            if fr not in index:
+                index[fr] = len(frames)
+                frames.append({"name": fr[1], "file": fr[0], "line": fr[2]})
+            ids.append(index[fr])
+        stacks.append(ids)
+        weights.append(count * interval_ms)
+    name = f"{meta['method']} {meta['path']} ({meta['duration_ms']:.0f} ms)"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "common.profiling",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": meta["duration_ms"],
+            "samples": stacks,
+            "weights": weights,
+        }],
+        # speedscope bỏ qua key lạ; giữ SQL + thông tin request chung 1 file
+        "metadata": meta,
+    }
+
+
+def to_collapsed(doc):
+    """speedscope -> collapsed stack ("a;b;c <ms>") cho flamegraph.pl / inferno."""
+    frames = doc["shared"]["frames"]
+    prof = doc["profiles"][0]
+    lines = []
+    for ids, weight in zip(prof["samples"], prof["weights"]):
+        lines.append(";".join(f"{frames[i]['name']} ({os.path.basename(frames[i]['file'])})" for i in ids) + f" {weight:g}")
+    return "\n".join(lines) + "\n"
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix(".meta.json")
+
+
+def _write_json(root, path, data):
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def save_profile(doc):
+    root = profile_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    name = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}.json"
+    # profile trước, meta sau: list thấy meta thì file tải về đã có
+    _write_json(root, root / name, doc)
+    _write_json(root, _meta_path(root / name), {k: v for k, v in doc["metadata"].items() if k != "sql"})
+
+    keep = getattr(settings, "PROFILER_MAX_FILES", 200)
+    files = sorted(p for p in root.iterdir() if PROFILE_NAME_RE.match(p.name))
+    for old in files[:-keep]:
+        _meta_path(old).unlink(missing_ok=True)
+        old.unlink(missing_ok=True)
+    return name
+
+
+def list_profiles():
+    """[(name, metadata không kèm SQL)] mới nhất trước; chỉ đọc các file .meta.json nhỏ."""
+    root = profile_dir()
+    if not root.is_dir():
+        return []
+    out = []
+    for p in sorted((p for p in root.iterdir() if PROFILE_NAME_RE.match(p.name)), reverse=True):
+        try:
+            with _meta_path(p).open(encoding="utf-8") as f:
+                out.append((p.name, json.load(f)))
+        except (OSError, ValueError):
+            continue  # vừa bị ring buffer xoá / đang ghi dở
+    return out
+
+
+# ----------------- Middleware -----------------
+class SlowRequestProfilerMiddleware:
+    """Đặt đầu MIDDLEWARE để đo trọn request."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILER_ENABLED", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "PROFILER_SLOW_MS", 500)
+        self.sample_rate = getattr(settings, "PROFILER_SAMPLE_RATE", 0.0)
+        self.interval_ms = getattr(settings, "PROFILER_INTERVAL_MS", 5)
+        self.max_sql = getattr(settings, "PROFILER_MAX_SQL", 500)
+        self.sampler = _get_sampler()
+
+    def __call__(self, request):
+        tid = threading.get_ident()
+        recorder = _SqlRecorder(self.max_sql)
+        self.sampler.track(tid)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            samples = self.sampler.untrack(tid)
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        if duration_ms >= self.slow_ms or (self.sample_rate and random.random() < self.sample_rate):
+            meta = {
+                "method": request.method,
+                "path": request.get_full_path(),
+                "status": response.status_code,
+                "duration_ms": round(duration_ms, 3),
+                "at": time.time(),
+                "sampled": duration_ms < self.slow_ms,
+                "sql_count": recorder.total,
+                "sql_ms": round(sum(q["ms"] for q in recorder.queries), 3),
+                "sql": recorder.queries,
+            }
+            save_profile(to_speedscope(samples, self.interval_ms, meta))
+        return response
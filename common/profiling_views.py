@@ -0,0 +1,57 @@
+# common/profiling_views.py
+"""Trang staff xem/tải profile request chậm (mount dưới /admin/profiles/ qua admin.site.admin_view)."""
+import json
+from datetime import datetime
+
+from django.http import Http404, HttpResponse
+from django.utils.html import format_html, format_html_join
+
+from .profiling import PROFILE_NAME_RE, list_profiles, profile_dir, to_collapsed
+
+
+def profile_list(request):
+    rows = format_html_join(
+        "\n",
+        "<tr><td>{}</td><td>{} {}</td><td>{}</td><td>{}</td><td>{} ({} ms)</td>"
+        "<td><a href='{}/'>speedscope</a> · <a href='{}/collapsed/'>collapsed</a></td></tr>",
+        (
+            (
+                datetime.fromtimestamp(m.get("at", 0)).strftime("%Y-%m-%d %H:%M:%S"),
+                m.get("method", ""), m.get("path", ""), m.get("status", ""),
+                f"{m.get('duration_ms', 0):.0f}", m.get("sql_count", 0), f"{m.get('sql_ms', 0):.0f}",
+                name, name,
+            )
+            for name, m in list_profiles()
+        ),
+    )
+    html = format_html(
+        "<h1>Slow request profiles</h1>"
+        "<p>Mở file speedscope ở https://www.speedscope.app/ ; SQL nằm trong key metadata.sql.</p>"
+        "<table border='1' cellpadding='4'><tr><th>Time</th><th>Request</th><th>Status</th>"
+        "<th>ms</th><th>SQL</th><th>Download</th></tr>{}</table>",
+        rows,
+    )
+    return HttpResponse(html)
+
+
+def _load(name):
+    if not PROFILE_NAME_RE.match(name):
+        raise Http404
+    path = profile_dir() / name
+    try:
+        with path.open(encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise Http404
+
+
+def profile_download(request, name, fmt="speedscope"):
+    doc = _load(name)
+    if fmt == "collapsed":
+        resp = HttpResponse(to_collapsed(doc), content_type="text/plain; charset=utf-8")
+        filename = name.replace(".json", ".collapsed.txt")
+    else:
+        resp = HttpResponse(json.dumps(doc), content_type="application/json")
+        filename = name.replace(".json", ".speedscope.json")
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return resp
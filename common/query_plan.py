@@ -0,0 +1,66 @@
+# common/query_plan.py
+"""
+Đọc EXPLAIN của 1 queryset và liệt kê chỗ plan bị "xấu": full table scan hoặc filesort.
+Dùng trong test (orders/tests.py, products/tests.py) để chặn regression khi đổi index/query.
+
+Hỗ trợ MySQL (EXPLAIN FORMAT=JSON) và SQLite (EXPLAIN QUERY PLAN, để chạy test local).
+"""
+import json
+import re
+
+from django.db import connections
+
+
+def _walk(node):
+    if isinstance(node, dict):
+        yield node
+        for v in node.values():
+            yield from _walk(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from _walk(v)
+
+
+def _mysql_problems(plan):
+    problems = []
+    for node in _walk(json.loads(plan)):
+        if node.get("access_type") == "ALL":
+            problems.append(f"full scan: {node.get('table_name')}")
+        if node.get("using_filesort"):
+            problems.append("filesort")
+        if node.get("using_temporary_table"):
+            problems.append("temporary table")
+    return problems
+
+
+def _sqlite_problems(plan):
+    problems = []
+    for line in plan.splitlines():
+        # "SCAN orders_order" = full scan; "SCAN ... USING INDEX x" = duyệt theo index (ok với ORDER BY + LIMIT)
+        m = re.search(r"\bSCAN (\w+)(.*)", line)
+        if m and "USING" not in m.group(2):
+            problems.append(f"full scan: {m.group(1)}")
+        if "USE TEMP B-TREE" in line:
+            problems.append("filesort")
+    return problems
+
+
+def plan_problems(queryset):
+    """Trả list vấn đề trong plan của queryset (rỗng = dùng index, không sort ngoài)."""
+    vendor = connections[queryset.db].vendor
+    if vendor == "mysql":
+        return _mysql_problems(queryset.explain(format="json"))
+    if vendor == "sqlite":
+        return _sqlite_problems(queryset.explain())
+    raise NotImplementedError(f"chưa hỗ trợ EXPLAIN cho {vendor}")
+
+
+def analyze(*models, using="default"):
+    """MySQL: cập nhật thống kê sau khi seed data test, tránh optimizer chọn full scan vì bảng 'rỗng'."""
+    conn = connections[using]
+    if conn.vendor != "mysql":
+        return
+    with conn.cursor() as cur:
+        for model in models:
+            cur.execute(f"ANALYZE TABLE {conn.ops.quote_name(model._meta.db_table)}")
+            cur.fetchall()
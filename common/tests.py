@@ -0,0 +1,139 @@
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from users.models import User
+from . import profiling
+from .profiling import SlowRequestProfilerMiddleware, _Sampler, list_profiles, save_profile
+
+
+class ProfileDirMixin:
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        override = override_settings(PROFILER_DIR=self.root, PROFILER_MAX_FILES=3)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def doc(self, path="/x", sql=None):
+        meta = {"method": "GET", "path": path, "status": 200, "duration_ms": 12.0, "at": time.time(),
+                "sql_count": len(sql or []), "sql_ms": 0, "sql": sql or []}
+        return profiling.to_speedscope({(("f.py", "view", 1),): 2}, 5, meta)
+
+
+class SamplerTests(SimpleTestCase):
+    def test_untrack_hands_off_counter(self):
+        sampler = _Sampler(1)  # không start: gọi sample() bằng tay
+        tid = threading.get_ident()
+        sampler.track(tid)
+        sampler.sample()
+        sampler.sample()
+        samples = sampler.untrack(tid)
+        self.assertEqual(sum(samples.values()), 2)
+        self.assertIn("test_untrack_hands_off_counter", [fr[1] for fr in next(iter(samples))])
+
+        sampler.sample()  # sau untrack, sampler không còn ghi vào Counter đã trả
+        self.assertEqual(sum(samples.values()), 2)
+        self.assertEqual(sampler.untrack(tid), {})
+
+    def test_sample_waits_for_lock(self):
+        sampler = _Sampler(1)
+        sampler.track(threading.get_ident())
+        with sampler.lock:
+            t = threading.Thread(target=sampler.sample)
+            t.start()
+            t.join(0.05)
+            self.assertTrue(t.is_alive())  # đang chờ lock, chưa đụng Counter
+        t.join()
+
+
+class RingBufferTests(ProfileDirMixin, SimpleTestCase):
+    def test_keeps_newest_and_lists_metadata_without_sql(self):
+        names = []
+        for i in range(5):
+            names.append(save_profile(self.doc(f"/p{i}", sql=[{"sql": "SELECT 1", "ms": 1}])))
+            time.sleep(0.002)  # tên theo ms
+
+        listed = list_profiles()
+        self.assertEqual([n for n, _ in listed], names[:1:-1])
+        self.assertEqual(listed[0][1]["path"], "/p4")
+        self.assertNotIn("sql", listed[0][1])
+        self.assertEqual(len(list(self.root.glob("*.meta.json"))), 3)
+        self.assertEqual(len(list(self.root.glob("*.json"))), 6)
+
+    def test_list_does_not_read_profiles(self):
+        save_profile(self.doc())
+        real_open = Path.open
+
+        def guarded(path, *args, **kwargs):
+            assert path.name.endswith(".meta.json"), path
+            return real_open(path, *args, **kwargs)
+
+        with mock.patch.object(Path, "open", guarded):
+            self.assertEqual(len(list_profiles()), 1)
+
+
+class MiddlewareTests(ProfileDirMixin, TestCase):
+    def middleware(self, view, **settings):
+        with override_settings(PROFILER_ENABLED=True, PROFILER_INTERVAL_MS=1, **settings):
+            return SlowRequestProfilerMiddleware(view)
+
+    def test_disabled_removes_itself(self):
+        with override_settings(PROFILER_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            SlowRequestProfilerMiddleware(lambda r: HttpResponse())
+
+    def test_slow_request_saved_with_sql(self):
+        def view(request):
+            User.objects.count()
+            time.sleep(0.03)
+            return HttpResponse(status=201)
+
+        mw = self.middleware(view, PROFILER_SLOW_MS=10)
+        self.assertEqual(mw(RequestFactory().get("/slow/?a=1")).status_code, 201)
+
+        [(name, meta)] = list_profiles()
+        self.assertEqual((meta["path"], meta["status"], meta["sql_count"], meta["sampled"]), ("/slow/?a=1", 201, 1, False))
+        doc = json.loads((self.root / name).read_text())
+        self.assertIn("users_user", doc["metadata"]["sql"][0]["sql"])
+        self.assertTrue(doc["profiles"][0]["samples"])  # sampler thật đã lấy được mẫu
+
+    def test_fast_request_not_saved(self):
+        mw = self.middleware(lambda r: HttpResponse(), PROFILER_SLOW_MS=10_000)
+        mw(RequestFactory().get("/fast/"))
+        self.assertEqual(list_profiles(), [])
+        self.assertEqual(mw.sampler.active, {})
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class ProfileViewTests(ProfileDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.name = save_profile(self.doc("/orders/"))
+        self.staff = User.objects.create(username="staff", phone="0999999999", is_staff=True)
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get("/admin/profiles/").status_code, 302)  # về trang login admin
+        self.client.force_login(self.staff)
+        resp = self.client.get("/admin/profiles/")
+        self.assertContains(resp, "/orders/")
+        self.assertContains(resp, f"{self.name}/collapsed/")
+
+    def test_download(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get(f"/admin/profiles/{self.name}/")
+        self.assertEqual(json.loads(resp.content)["metadata"]["path"], "/orders/")
+        self.assertIn("attachment", resp["Content-Disposition"])
+        resp = self.client.get(f"/admin/profiles/{self.name}/collapsed/")
+        self.assertEqual(resp.content.decode(), "view (f.py) 10\n")
+        self.assertEqual(self.client.get("/admin/profiles/../secret.json/").status_code, 404)
+        self.assertEqual(self.client.get("/admin/profiles/0000000000000-deadbeef.json/").status_code, 404)
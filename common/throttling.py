@@ -0,0 +1,181 @@
+# common/throttling.py
+"""
+Throttle dạng token bucket / sliding window, cắm vào hook throttle_classes của DRF.
+
+Rate lấy từ REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] theo scope; tra "<scope>.<action>"
+trước rồi mới tới "<scope>", nên mỗi action của viewset có thể có rate riêng:
+
+    "DEFAULT_THROTTLE_RATES": {"orders": "120/min", "orders.create": "20/min"}
+
+Store chọn qua settings.THROTTLE_STORE (mặc định LocMemBucketStore, mỗi process 1 bucket;
+nhiều worker thì dùng CacheBucketStore trên cache chung có incr atomic như redis/memcached).
+Throttle chạy trong APIView.initial(), sau authentication và trước handler: request bị chặn không
+chạy query nghiệp vụ nào, nhưng view dùng JWTAuthentication thì đã tốn 1 query load user
+(register/check/token là ẩn danh nên không có query này).
+
+IP lấy qua get_ident() của DRF theo REST_FRAMEWORK["NUM_PROXIES"]: 0 (mặc định) = REMOTE_ADDR,
+bỏ qua X-Forwarded-For do client tự gửi; đứng sau N reverse proxy thì đặt NUM_PROXIES=N.
+"""
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/min' -> (10, 60). '5/30s' cũng được -> (5, 30). None -> None."""
+    if rate is None:
+        return None
+    num, period = rate.split("/")
+    unit = period.lstrip("0123456789")
+    mult = int(period[: len(period) - len(unit)] or 1)
+    return int(num), mult * PERIODS[unit[0]]
+
+
+# ----------------- Stores -----------------
+class BaseBucketStore:
+    def consume(self, key, limit, period):
+        """Trả (allowed, wait_seconds)."""
+        raise NotImplementedError
+
+
+class LocMemBucketStore(BaseBucketStore):
+    """Token bucket trong RAM của process: O(1), không I/O."""
+
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, last_ts]
+
+    def consume(self, key, limit, period):
+        now = time.monotonic()
+        refill = limit / period
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                if len(self._buckets) >= self.MAX_KEYS:
+                    self._sweep(now)
+                b = self._buckets[key] = [float(limit), now]
+            else:
+                b[0] = min(limit, b[0] + (now - b[1]) * refill)
+                b[1] = now
+            if b[0] >= 1:
+                b[0] -= 1
+                return True, None
+            return False, (1 - b[0]) / refill
+
+    def _sweep(self, now):
+        # bucket không bị dùng lâu hơn 1 giờ coi như đã đầy lại -> bỏ; vẫn đầy thì xoá hết
+        stale = [k for k, (_, ts) in self._buckets.items() if now - ts > 3600]
+        for k in stale:
+            del self._buckets[k]
+        if len(self._buckets) >= self.MAX_KEYS:
+            self._buckets.clear()
+
+
+class CacheBucketStore(BaseBucketStore):
+    """
+    Sliding window counter trên Django cache (settings.THROTTLE_CACHE, mặc định "default").
+    Mỗi quyết định = 1 get + 1 add/incr; incr atomic trên redis/memcached.
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, "THROTTLE_CACHE", "default")]
+
+    def consume(self, key, limit, period):
+        now = time.time()
+        window = int(now // period)
+        elapsed = (now % period) / period
+        cur_key = f"throttle:{key}:{window}"
+        prev = self.cache.get(f"throttle:{key}:{window - 1}", 0)
+        if self.cache.add(cur_key, 1, timeout=period * 2):
+            cur = 1
+        else:
+            try:
+                cur = self.cache.incr(cur_key)
+            except ValueError:  # key vừa hết hạn giữa add và incr
+                self.cache.add(cur_key, 1, timeout=period * 2)
+                cur = 1
+        if prev * (1 - elapsed) + cur <= limit:
+            return True, None
+        return False, period * (1 - elapsed)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> BaseBucketStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = getattr(settings, "THROTTLE_STORE", "common.throttling.LocMemBucketStore")
+                _store = import_string(path)()
+    return _store
+
+
+# ----------------- Throttles -----------------
+class BucketRateThrottle(BaseThrottle):
+    """
+    Rate theo view.throttle_scope (+ ".<action>"), key theo `key_by`:
+      "user"          user id nếu đã đăng nhập, không thì IP
+      "ip"            IP (REMOTE_ADDR, hoặc X-Forwarded-For khi NUM_PROXIES > 0)
+      "claim:<name>"  claim trong JWT đã verify (request.auth), không có thì IP
+    View có thể đặt `throttle_key_by` để đổi key cho riêng nó.
+    """
+
+    key_by = "user"
+
+    def get_rate(self, view):
+        scope = getattr(view, "throttle_scope", None)
+        if not scope:
+            return None
+        rates = api_settings.DEFAULT_THROTTLE_RATES or {}
+        action = getattr(view, "action", None)
+        if action and f"{scope}.{action}" in rates:
+            return f"{scope}.{action}", parse_rate(rates[f"{scope}.{action}"])
+        return scope, parse_rate(rates.get(scope))
+
+    def get_ident_key(self, request, view):
+        key_by = getattr(view, "throttle_key_by", self.key_by)
+        if key_by == "user":
+            # initial() đã authenticate trước khi check throttle -> request.user có sẵn
+            user = request.user
+            if user is not None and user.is_authenticated:
+                return f"user:{user.pk}"
+        elif key_by.startswith("claim:"):
+            name = key_by.split(":", 1)[1]
+            token = request.auth
+            value = token.get(name) if token is not None and hasattr(token, "get") else None
+            if value is not None:
+                return f"{name}:{value}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        self._wait = None
+        scope, rate = self.get_rate(view) or (None, None)
+        if rate is None:
+            return True
+        limit, period = rate
+        key = f"{scope}:{self.get_ident_key(request, view)}"
+        allowed, self._wait = get_store().consume(key, limit, period)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class IPBucketRateThrottle(BucketRateThrottle):
+    """Cho endpoint ẩn danh (register/token): mặc định key theo IP."""
+
+    key_by = "ip"
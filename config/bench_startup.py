@@ -0,0 +1,68 @@
+"""
+Đo thời gian khởi động theo từng profile settings:
+    python -m config.bench_startup [--runs 5] [--path /api/]
+
+Mỗi lần chạy là 1 process mới: import + django.setup() + nạp WSGI app, rồi 1 request đầu tiên
+(mặc định /api/ - API root, chưa có token nên trả 401, không đụng DB) qua django.test.Client.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+t1 = time.perf_counter()
+from django.test import Client
+resp = Client().get(sys.argv[1], HTTP_ACCEPT="application/json")
+t2 = time.perf_counter()
+from django.conf import settings
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_request_ms": (t2 - t1) * 1000,
+    "status": resp.status_code,
+    "modules": len(sys.modules),
+    "middleware": len(settings.MIDDLEWARE),
+    "apps": len(settings.INSTALLED_APPS),
+}))
+"""
+
+
+def run_once(profile, path):
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "config.settings",
+        "DJANGO_PROFILE": profile,
+        "ALLOWED_HOSTS": os.environ.get("ALLOWED_HOSTS", "testserver"),
+    }
+    proc = subprocess.run([sys.executable, "-c", CHILD, path], env=env, capture_output=True, text=True)
+    if proc.returncode:
+        sys.exit(f"[{profile}] lỗi:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/")
+    parser.add_argument("--profiles", default="dev,api")
+    args = parser.parse_args()
+
+    print(f"{'profile':<8} {'import ms':>10} {'1st req ms':>11} {'status':>7} {'modules':>8} {'mw':>3} {'apps':>5}")
+    for profile in args.profiles.split(","):
+        rows = [run_once(profile, args.path) for _ in range(args.runs)]
+        last = rows[-1]
+        print(
+            f"{profile:<8} {statistics.median(r['import_ms'] for r in rows):>10.1f} "
+            f"{statistics.median(r['first_request_ms'] for r in rows):>11.1f} {last['status']:>7} "
+            f"{last['modules']:>8} {last['middleware']:>3} {last['apps']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
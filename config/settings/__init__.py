@@ -0,0 +1,13 @@
+"""
+Chọn profile settings theo biến môi trường DJANGO_PROFILE:
+    dev (mặc định)  DEBUG, đủ admin/session/messages như trước
+    api             production cho JWT API: middleware tối thiểu, không admin (trừ khi API_ENABLE_ADMIN=1),
+                    cached template loader, persistent DB connection
+DJANGO_SETTINGS_MODULE vẫn là config.settings (hoặc trỏ thẳng config.settings.api).
+"""
+import os
+
+if os.getenv("DJANGO_PROFILE", "dev") == "api":
+    from .api import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
@@ -0,0 +1,61 @@
+"""Profile production cho JWT API. Bật admin: API_ENABLE_ADMIN=1."""
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, INSTALLED_APPS, REST_FRAMEWORK, os
+
+DEBUG = False
+
+API_ENABLE_ADMIN = os.getenv("API_ENABLE_ADMIN", "0") == "1"
+
+# admin cần session/messages/staticfiles; API JWT thì không -> chỉ nạp khi bật admin
+_ADMIN_APPS = [
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+]
+if not API_ENABLE_ADMIN:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in _ADMIN_APPS]
+
+# JWT auth do DRF làm trong view, không cần Session/Auth/CSRF/Messages middleware
+MIDDLEWARE = [
+    "common.profiling.SlowRequestProfilerMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+if API_ENABLE_ADMIN:
+    MIDDLEWARE += [
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    ]
+
+# chỉ JSON: không nạp template/browsable API cho mỗi response
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+}
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "OPTIONS": {
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+            ] + (["django.contrib.messages.context_processors.messages"] if API_ENABLE_ADMIN else []),
+        },
+    },
+]
+
+# giữ kết nối MySQL giữa các request thay vì connect lại mỗi lần
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
@@ -0,0 +1,264 @@
+"""
+Django settings for config project (phần chung cho mọi profile, xem config/settings/__init__.py).
+
+Generated by 'django-admin startproject' using Django 5.2.7.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+
+from pathlib import Path
+import os
+from dotenv import load_dotenv
+from datetime import timedelta
+
+load_dotenv()
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.getenv("SECRET_KEY", 'django-insecure-)+k^d5u=3_61ul)5=uar4kvahwp=kt(24m$owp-p%**hrowwt8')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+# DEBUG=True giữ mọi câu SQL trong connection.queries -> chỉ bật ở profile dev
+DEBUG = False
+
+ALLOWED_HOSTS = [h for h in os.getenv("ALLOWED_HOSTS", "").split(",") if h]
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    "rest_framework","django_filters",
+    "products",
+    "users",
+    "orders",
+    # "orders.apps.OrdersConfig",
+]
+
+REST_FRAMEWORK = {
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
+    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "PAGE_SIZE": 20,
+    "DEFAULT_FILTER_BACKENDS": [
+        "django_filters.rest_framework.DjangoFilterBackend",
+        "rest_framework.filters.SearchFilter",
+        "rest_framework.filters.OrderingFilter",
+    ],
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework_simplejwt.authentication.JWTAuthentication",
+    ],
+    # số reverse proxy phía trước: 0 = key throttle theo REMOTE_ADDR, không tin X-Forwarded-For của client
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
+    # deadlock / lock wait đã hết lượt chạy lại (common.db_retry) -> 503 + Retry-After thay vì 500
+    "EXCEPTION_HANDLER": "common.db_retry.exception_handler",
+    # view không khai báo throttle_scope thì throttle bỏ qua (không tốn gì)
+    "DEFAULT_THROTTLE_CLASSES": ["common.throttling.BucketRateThrottle"],
+    "DEFAULT_THROTTLE_RATES": {
+        "register": os.getenv("THROTTLE_REGISTER", "5/min"),
+        "register_check": os.getenv("THROTTLE_REGISTER_CHECK", "60/min"),
+        "login": os.getenv("THROTTLE_LOGIN", "10/min"),
+        "orders": os.getenv("THROTTLE_ORDERS", "120/min"),
+        "orders.create": os.getenv("THROTTLE_CHECKOUT", "20/min"),
+        "orders.quote": os.getenv("THROTTLE_QUOTE", "120/min"),
+    },
+}
+
+# LocMemBucketStore: mỗi process 1 bucket; nhiều worker dùng common.throttling.CacheBucketStore + cache chung
+THROTTLE_STORE = os.getenv("THROTTLE_STORE", "common.throttling.LocMemBucketStore")
+
+MIDDLEWARE = [
+    'common.profiling.SlowRequestProfilerMiddleware',  # tắt (mặc định) thì tự gỡ khỏi chain
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+AUTH_USER_MODEL = "users.User"
+
+ROOT_URLCONF = 'config.urls'
+
+SIMPLE_JWT = {
+    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
+    "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+}
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'config.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.mysql",
+        "NAME": os.getenv("DB_NAME", "demo_store"),
+        "USER": os.getenv("DB_USER", "root"),
+        "PASSWORD": os.getenv("DB_PASS", ""),
+        "HOST": os.getenv("DB_HOST", "localhost"),
+        "PORT": os.getenv("DB_PORT", "3306"),
+        "OPTIONS": {"charset": "utf8mb4"},
+    }
+}
+# Chờ khoá dòng tối đa bao nhiêu giây (InnoDB mặc định 50s): đặt ngắn để checkout báo lỗi sớm thay vì treo
+DB_LOCK_WAIT_TIMEOUT = os.getenv("DB_LOCK_WAIT_TIMEOUT")
+if DB_LOCK_WAIT_TIMEOUT:
+    DATABASES["default"]["OPTIONS"]["init_command"] = (
+        f"SET SESSION innodb_lock_wait_timeout = {int(DB_LOCK_WAIT_TIMEOUT)}"
+    )
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    # {
+    #     'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    # },
+    # {
+    #     'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    # },
+    # {
+    #     'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    # },
+    # {
+    #     'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    # },
+]
+
+
+# Cache dùng chung giữa các worker (redis); không có REDIS_URL thì locmem - chỉ trong 1 process
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Snapshot giá sản phẩm trong RAM mỗi process (products.pricing), invalidate theo version trong cache.
+# Bật thì cache phải dùng chung (check products.E001), mặc định bật khi có REDIS_URL.
+PRICE_SNAPSHOT_ENABLED = os.getenv("PRICE_SNAPSHOT_ENABLED", "1" if REDIS_URL else "0") == "1"
+PRICE_SNAPSHOT_MAX_AGE = int(os.getenv("PRICE_SNAPSHOT_MAX_AGE", "60"))  # giây, chặn trên độ cũ kể cả khi lỡ bump
+
+# Chạy lại transaction đơn hàng khi deadlock / lock wait timeout (common.db_retry)
+DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
+DB_RETRY_BASE_DELAY_MS = float(os.getenv("DB_RETRY_BASE_DELAY_MS", "10"))
+DB_RETRY_MAX_DELAY_MS = float(os.getenv("DB_RETRY_MAX_DELAY_MS", "200"))
+# Chạy lại cả lock wait timeout (1205)? Mỗi lần đã chờ innodb_lock_wait_timeout -> chỉ bật kèm DB_LOCK_WAIT_TIMEOUT ngắn
+DB_RETRY_LOCK_WAIT = os.getenv("DB_RETRY_LOCK_WAIT", "0") == "1"
+DB_RETRY_AFTER_SECONDS = int(os.getenv("DB_RETRY_AFTER_SECONDS", "1"))  # header Retry-After của 503
+
+# Profiler request chậm (common.profiling), xem ở /admin/profiles/
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_SLOW_MS = float(os.getenv("PROFILER_SLOW_MS", "500"))
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_DIR = Path(os.getenv("PROFILER_DIR", BASE_DIR / "profiles"))
+PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", "200"))
+PROFILER_MAX_SQL = int(os.getenv("PROFILER_MAX_SQL", "500"))
+
+# Admin changelist bảng lớn (common.paginator.EstimatedCountPaginator)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv("ADMIN_ESTIMATED_COUNT_THRESHOLD", "10000"))
+ADMIN_COUNT_CACHE_TTL = int(os.getenv("ADMIN_COUNT_CACHE_TTL", "60"))
+
+# Archive đơn cancelled/refunded cũ (python manage.py archive_orders)
+ORDER_ARCHIVE_RETENTION_DAYS = int(os.getenv("ORDER_ARCHIVE_RETENTION_DAYS", "365"))
+
+# Outbox event đơn hàng (python manage.py relay_order_events --sink default)
+ORDER_EVENT_SINKS = {
+    "default": {
+        "BACKEND": "orders.outbox.FileSink",
+        "OPTIONS": {"path": os.getenv("ORDER_EVENT_FILE", str(BASE_DIR / "order_events.ndjson"))},
+    },
+}
+if os.getenv("ORDER_EVENT_WEBHOOK_URL"):
+    ORDER_EVENT_SINKS["webhook"] = {
+        "BACKEND": "orders.outbox.WebhookSink",
+        "OPTIONS": {"url": os.getenv("ORDER_EVENT_WEBHOOK_URL")},
+    }
+
+# Password hashing
+# Hasher đầu list dùng để hash mới; các hasher sau chỉ để verify hash cũ, user login là được rehash.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "argon2")  # argon2 | scrypt | pbkdf2
+_PASSWORD_HASHERS = {
+    "argon2": "users.hashers.TunedArgon2PasswordHasher",
+    "scrypt": "users.hashers.TunedScryptPasswordHasher",
+    "pbkdf2": "users.hashers.TunedPBKDF2PasswordHasher",
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", "102400"))  # KiB
+# 1 lane = 1 thread/hash: pool PASSWORD_HASH_WORKERS mới thật sự giới hạn số core (workers × parallelism)
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "1"))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.getenv("PASSWORD_SCRYPT_WORK_FACTOR", str(2 ** 14)))
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+
+# Hash/verify chạy trên pool giới hạn (users.hashing) để burst login không ăn hết CPU của checkout
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+AUTHENTICATION_BACKENDS = ["users.backends.PooledModelBackend"]
+
+# /api/auth/register/check/: bloom filter username/phone đã dùng (mỗi process) + cache kết quả "đã dùng"
+REGISTER_BLOOM_REFRESH = int(os.getenv("REGISTER_BLOOM_REFRESH", "30"))  # giây giữa 2 lần nạp user mới theo id
+REGISTER_TAKEN_CACHE_TTL = int(os.getenv("REGISTER_TAKEN_CACHE_TTL", "60"))
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = "en-us"
+TIME_ZONE = "Asia/Ho_Chi_Minh"
+USE_I18N = True
+USE_TZ = True
+
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+STATIC_URL = 'static/'
+
+# Snapshot JSON tĩnh của catalogue (python manage.py export_catalogue) cho nginx/CDN
+CATALOGUE_SNAPSHOT_DIR = Path(os.getenv("CATALOGUE_SNAPSHOT_DIR", BASE_DIR / "snapshots"))
+CATALOGUE_SNAPSHOT_ON_SAVE = os.getenv("CATALOGUE_SNAPSHOT_ON_SAVE", "0") == "1"
+CATALOGUE_SNAPSHOT_DEBOUNCE = float(os.getenv("CATALOGUE_SNAPSHOT_DEBOUNCE", "5"))  # giây, build trên thread nền
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
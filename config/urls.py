@@ -14,11 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from products.views import ProductViewSet
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
+from users.views import TokenObtainView
 from orders.views import OrderViewSet
 
 
@@ -27,10 +28,23 @@ router.register(r"products", ProductViewSet, basename="product")
 router.register(r"orders", OrderViewSet, basename="order")
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/", include(router.urls)),
     path("api/auth/", include("users.urls")),  # /api/auth/register/
-    path("api/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("api/auth/token/", TokenObtainView.as_view(), name="token_obtain_pair"),
     path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     
 ]
+
+# profile api tắt admin mặc định (config/settings/api.py)
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+    from common import profiling_views
+
+    urlpatterns[:0] = [
+        # đặt trước admin.site.urls (admin có catch-all)
+        path("admin/profiles/", admin.site.admin_view(profiling_views.profile_list), name="profile_list"),
+        path("admin/profiles/<str:name>/", admin.site.admin_view(profiling_views.profile_download), name="profile_download"),
+        path("admin/profiles/<str:name>/collapsed/", admin.site.admin_view(profiling_views.profile_download),
+             {"fmt": "collapsed"}, name="profile_download_collapsed"),
+        path("admin/", admin.site.urls),
+    ]
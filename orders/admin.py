@@ -1,11 +1,15 @@
 # orders/admin.py
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.db.models import F
 from django.db.models.functions import Greatest
 
-from .models import Order, OrderItem
+from .models import Order, OrderArchive, OrderEvent, OrderItem, OrderItemArchive
+from .events import record_order_event
 from products.models import Product
+from common.db_retry import retry_on_lock_error
+from common.paginator import EstimatedCountPaginator
 
 
 # ----------------- Helpers -----------------
@@ -20,13 +24,18 @@ def _release_all_stock(order: Order):
 
 def _reserve_all_stock(order: Order):
     """Giữ kho cho toàn bộ item của 1 đơn. Trả None nếu OK; ngược lại trả về thông báo lỗi."""
-    # check trước
-    for it in order.items.select_related("product"):
-        p = Product.objects.select_for_update().get(pk=it.product_id)
+    items = list(order.items.all())
+    # check trước (khoá Product theo thứ tự id như checkout -> không deadlock với nhau)
+    products = (
+        Product.objects.select_for_update().only("id", "name", "stock")
+        .order_by("id").in_bulk([it.product_id for it in items])
+    )
+    for it in items:
+        p = products[it.product_id]
         if p.stock < it.quantity:
             return f"'{p.name}' thiếu kho (còn {p.stock}, cần {it.quantity})"
     # giữ kho
-    for it in order.items.all():
+    for it in items:
         Product.objects.filter(pk=it.product_id).update(
             stock=F("stock") - it.quantity,
             sold_count=F("sold_count") + it.quantity,
@@ -34,6 +43,11 @@ def _reserve_all_stock(order: Order):
     return None
 
 
+def _locked(queryset):
+    """Khoá các Order được chọn (theo id) và đọc lại status ngay trong transaction của action."""
+    return queryset.select_related(None).select_for_update().order_by("id")
+
+
 def _apply_stock_diff(product_id: int, diff: int):
     """diff>0: bán thêm (trừ); diff<0: trả bớt (cộng)."""
     if diff == 0:
@@ -51,35 +65,43 @@ def _apply_stock_diff(product_id: int, diff: int):
 
 # ----------------- Admin actions (dùng với dropdown + Go) -----------------
 @admin.action(description="Đánh dấu Paid")
+@retry_on_lock_error
+@transaction.atomic
 def action_mark_paid(modeladmin, request, queryset):
-    for o in queryset.filter(status="pending"):
+    for o in _locked(queryset.filter(status="pending")):
         o.status = "paid"
         o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_PAID)
 
 
 @admin.action(description="Hủy đơn (trả kho)")
+@retry_on_lock_error
 @transaction.atomic
 def action_cancel(modeladmin, request, queryset):
     # chỉ cho cancel từ pending
-    for o in queryset.filter(status="pending"):
+    for o in _locked(queryset.filter(status="pending")):
         _release_all_stock(o)
         o.status = "cancelled"
         o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_CANCELLED)
 
 
 @admin.action(description="Hoàn tiền (paid → refunded) + trả kho")
+@retry_on_lock_error
 @transaction.atomic
 def action_refund(modeladmin, request, queryset):
-    for o in queryset.filter(status="paid"):
+    for o in _locked(queryset.filter(status="paid")):
         _release_all_stock(o)
         o.status = "refunded"
         o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_REFUNDED)
 
 
 @admin.action(description="Mở lại đơn (cancelled/refunded → pending, giữ kho)")
+@retry_on_lock_error
 @transaction.atomic
 def action_reopen(modeladmin, request, queryset):
-    for o in queryset.filter(status__in=["cancelled", "refunded"]):  
+    for o in _locked(queryset.filter(status__in=["cancelled", "refunded"])):
         err = _reserve_all_stock(o)
         if err:
             modeladmin.message_user(
@@ -88,6 +110,7 @@ def action_reopen(modeladmin, request, queryset):
             continue
         o.status = "pending"
         o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_REOPENED)
 
 
 # ----------------- Inline -----------------
@@ -113,9 +136,14 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "status", "total", "created_at", "items_summary")
     list_filter = ("status",)
-    search_fields = ("user__username",)
+    # "^" = istartswith -> LIKE 'abc%' dùng được index unique của username (thay vì LIKE '%abc%')
+    search_fields = ("^user__username",)
     inlines = [OrderItemInline]
 
+    # không COUNT(*) chính xác mỗi lần load changelist
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     # CHỈ GIỮ ACTIONS (không list_editable → không còn nút Save ở list)
     actions = [action_mark_paid, action_cancel, action_refund, action_reopen]
 
@@ -134,16 +162,28 @@ class OrderAdmin(admin.ModelAdmin):
         if formset.model is not OrderItem:
             return super().save_formset(request, form, formset, change)
 
-        for obj in formset.deleted_objects:
-            _apply_stock_diff(obj.product_id, -obj.quantity)
-            obj.delete()
+        # khoá đơn rồi mới đọc số lượng cũ: form có thể đã cũ so với DB (đơn vừa bị hủy/sửa ở nơi khác)
+        o = form.instance
+        if not Order.objects.select_for_update().filter(pk=o.pk, status="pending").exists():
+            raise PermissionDenied(f"Order #{o.pk} không còn pending, không sửa items được")
+        current = {it.pk: it for it in OrderItem.objects.filter(order_id=o.pk)}
 
+        # commit=False: chưa ghi gì, chỉ điền new/changed/deleted_objects
         instances = formset.save(commit=False)
+        for obj in formset.deleted_objects:
+            old = current.pop(obj.pk, None)
+            if old is None:  # dòng đã bị xoá ở nơi khác
+                continue
+            _apply_stock_diff(old.product_id, -old.quantity)
+            old.delete()
+
         for inst in instances:
             is_new = inst.pk is None
+            if not is_new and inst.pk not in current:
+                continue
             old_qty, old_pid = 0, inst.product_id
             if not is_new:
-                old = OrderItem.objects.only("quantity", "product_id").get(pk=inst.pk)
+                old = current[inst.pk]
                 old_qty, old_pid = old.quantity, old.product_id
 
             inst.save()
@@ -160,19 +200,58 @@ class OrderAdmin(admin.ModelAdmin):
 
         formset.save_m2m()
 
-        o = form.instance
         o.total = sum(i.quantity * i.unit_price for i in o.items.all())
         o.save(update_fields=["total"])
+        record_order_event(o, OrderEvent.TYPE_UPDATED)
 
-    # Restock khi xoá Order trong admin
+    # Restock khi xoá Order trong admin (chỉ đơn còn giữ kho; cancelled/refunded đã trả rồi)
     @transaction.atomic
     def delete_model(self, request, obj):
-        _release_all_stock(obj)
+        locked = Order.objects.select_for_update().filter(pk=obj.pk).first()
+        if locked is None:  # đã bị xoá ở nơi khác
+            return
+        if locked.status in Order.STOCK_HOLDING_STATUSES:
+            _release_all_stock(locked)
+        record_order_event(locked, OrderEvent.TYPE_DELETED)
         return super().delete_model(request, obj)
 
     # Restock khi xoá hàng loạt Order trong admin
+    @retry_on_lock_error
     @transaction.atomic
     def delete_queryset(self, request, queryset):
-        for o in queryset:
-            _release_all_stock(o)
+        for o in _locked(queryset):
+            if o.status in Order.STOCK_HOLDING_STATUSES:
+                _release_all_stock(o)
+            record_order_event(o, OrderEvent.TYPE_DELETED)
         return super().delete_queryset(request, queryset)
+
+
+# ----------------- Archive (chỉ xem) -----------------
+class OrderItemArchiveInline(admin.TabularInline):
+    model = OrderItemArchive
+    extra = 0
+    fields = ("product", "quantity", "unit_price")
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj):
+        return False
+
+
+@admin.register(OrderArchive)
+class OrderArchiveAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "total", "created_at", "archived_at")
+    list_filter = ("status",)
+    search_fields = ("^user__username",)
+    inlines = [OrderItemArchiveInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,68 @@
+# orders/archive.py
+"""
+Chuyển đơn cũ đã kết thúc (cancelled/refunded) khỏi bảng nóng sang OrderArchive/OrderItemArchive.
+
+Mỗi batch 1 transaction: khoá batch id (SKIP LOCKED nếu DB hỗ trợ) -> bulk_create sang archive
+-> xoá khỏi Order/OrderItem. Tồn kho của các đơn này đã được trả lúc cancel/refund nên không đụng Product.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Order, OrderArchive, OrderEvent, OrderItem, OrderItemArchive
+from .events import record_order_events
+
+ORDER_FIELDS = ("id", "user_id", "status", "note", "total", "created_at", "updated_at")
+ITEM_FIELDS = ("id", "order_id", "product_id", "quantity", "unit_price", "created_at")
+
+
+def archive_statuses():
+    return tuple(getattr(settings, "ORDER_ARCHIVE_STATUSES", (Order.STATUS_CANCELLED, Order.STATUS_REFUNDED)))
+
+
+def retention_cutoff(days=None):
+    days = days if days is not None else getattr(settings, "ORDER_ARCHIVE_RETENTION_DAYS", 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(before):
+    # khớp index order_status_created_idx (status, -created_at, -id)
+    return Order.objects.filter(status__in=archive_statuses(), created_at__lt=before)
+
+
+@transaction.atomic
+def _archive_batch(before, batch_size):
+    qs = archivable(before).order_by("id")
+    if connection.features.has_select_for_update_skip_locked:
+        qs = qs.select_for_update(skip_locked=True)
+    else:
+        qs = qs.select_for_update()
+    ids = list(qs.values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return 0
+
+    archived = OrderArchive.objects.bulk_create(
+        [OrderArchive(**row) for row in Order.objects.filter(id__in=ids).values(*ORDER_FIELDS)]
+    )
+    OrderItemArchive.objects.bulk_create(
+        [OrderItemArchive(**row) for row in OrderItem.objects.filter(order_id__in=ids).values(*ITEM_FIELDS)]
+    )
+    OrderItem.objects.filter(order_id__in=ids).delete()
+    Order.objects.filter(id__in=ids).delete()
+    record_order_events(archived, OrderEvent.TYPE_ARCHIVED)
+    return len(ids)
+
+
+def archive_orders(before=None, batch_size=500, max_batches=None):
+    """Archive đơn tạo trước `before` (mặc định: hết hạn ORDER_ARCHIVE_RETENTION_DAYS). Trả số đơn đã chuyển."""
+    before = before or retention_cutoff()
+    moved, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        n = _archive_batch(before, batch_size)
+        if not n:
+            break
+        moved += n
+        batches += 1
+    return moved
@@ -0,0 +1,44 @@
+# orders/events.py
+"""
+Ghi event thay đổi trạng thái đơn vào outbox (OrderEvent) TRONG cùng transaction với thay đổi đó:
+rollback thì event cũng mất, commit thì chắc chắn có event. Đẩy đi bằng relay_order_events.
+Sau commit gán seq (orders.outbox.sequence_events) để /api/orders/changes/ thấy ngay mà không phải ghi.
+"""
+import logging
+
+from django.db import DatabaseError, transaction
+
+from .models import OrderEvent
+from .outbox import sequence_events
+
+logger = logging.getLogger(__name__)
+
+
+def _payload(order):
+    return {"id": order.pk, "user": order.user_id, "status": order.status, "total": str(order.total)}
+
+
+def _event(order, event_type):
+    return OrderEvent(order_id=order.pk, user_id=order.user_id, event_type=event_type, payload=_payload(order))
+
+
+def _sequence_after_commit():
+    try:
+        sequence_events()
+    except DatabaseError:
+        # đơn đã commit: không để lỗi gán seq thành 500; lần ghi sau / relay_order_events sẽ gán
+        logger.exception("gán seq cho OrderEvent lỗi")
+
+
+def record_order_event(order, event_type):
+    event = _event(order, event_type)
+    event.save()
+    transaction.on_commit(_sequence_after_commit)
+    return event
+
+
+def record_order_events(orders, event_type):
+    events = [_event(o, event_type) for o in orders]
+    if events:
+        OrderEvent.objects.bulk_create(events)
+        transaction.on_commit(_sequence_after_commit)
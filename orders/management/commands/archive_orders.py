@@ -0,0 +1,22 @@
+# orders/management/commands/archive_orders.py
+from django.core.management.base import BaseCommand
+
+from orders.archive import archivable, archive_orders, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Chuyển đơn cancelled/refunded quá hạn lưu (ORDER_ARCHIVE_RETENTION_DAYS) sang bảng archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="giữ lại đơn trong N ngày gần nhất")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--max-batches", type=int, help="dừng sau N batch (chạy rải trong giờ thấp điểm)")
+        parser.add_argument("--dry-run", action="store_true", help="chỉ đếm số đơn sẽ chuyển")
+
+    def handle(self, *args, **opts):
+        before = retention_cutoff(opts["days"])
+        if opts["dry_run"]:
+            self.stdout.write(f"{archivable(before).count()} đơn tạo trước {before:%Y-%m-%d} sẽ được archive")
+            return
+        moved = archive_orders(before, batch_size=opts["batch_size"], max_batches=opts["max_batches"])
+        self.stdout.write(self.style.SUCCESS(f"Đã archive {moved} đơn tạo trước {before:%Y-%m-%d}"))
@@ -0,0 +1,32 @@
+# orders/management/commands/relay_order_events.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import get_sink, prune_events, relay_batch
+
+
+class Command(BaseCommand):
+    help = "Đẩy OrderEvent từ outbox tới sink khai báo trong ORDER_EVENT_SINKS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sink", default="default")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--loop", action="store_true", help="chạy liên tục, nghỉ --interval giây khi hết event")
+        parser.add_argument("--interval", type=float, default=1.0)
+        parser.add_argument("--prune-days", type=int, help="sau khi relay, xoá event đã gửi cũ hơn N ngày")
+
+    def handle(self, *args, **opts):
+        sink = get_sink(opts["sink"])
+        total = 0
+        while True:
+            n = relay_batch(opts["sink"], sink, batch_size=opts["batch_size"])
+            total += n
+            if n:
+                continue
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
+        self.stdout.write(self.style.SUCCESS(f"[{opts['sink']}] đã relay {total} event"))
+        if opts["prune_days"] is not None:
+            self.stdout.write(f"đã xoá {prune_events(opts['prune_days'])} event cũ")
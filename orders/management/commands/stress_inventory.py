@@ -0,0 +1,75 @@
+# orders/management/commands/stress_inventory.py
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.stress import ADMIN_OPS, DEFAULT_WEIGHTS, StressData, admin_installed, run_stress
+
+
+class Command(BaseCommand):
+    help = (
+        "Chạy đồng thời ngẫu nhiên mọi đường đụng kho của đơn (API + admin) trên bộ sản phẩm riêng, "
+        "rồi kiểm bất biến stock + sold_count. Dùng DB thật (MySQL) để đo lock; không đụng dữ liệu có sẵn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--duration", type=float, default=10.0, help="giây")
+        parser.add_argument("--ops", type=int, help="dừng sau N thao tác (thay vì theo thời gian)")
+        parser.add_argument("--products", type=int, default=10, help="ít sản phẩm = tranh chấp nhiều")
+        parser.add_argument("--stock", type=int, default=200)
+        parser.add_argument("--users", type=int, default=8)
+        parser.add_argument("--seed-orders", type=int, default=40)
+        parser.add_argument(
+            "--weight", action="append", default=[], metavar="OP=N",
+            help=f"đổi tỉ lệ thao tác, vd --weight create=50 --weight admin_delete=0 ({', '.join(DEFAULT_WEIGHTS)})",
+        )
+        parser.add_argument("--keep", action="store_true", help="giữ lại dữ liệu stress để soi")
+
+    def handle(self, *args, **opts):
+        weights, asked = dict(DEFAULT_WEIGHTS), {}
+        for item in opts["weight"]:
+            name, _, value = item.partition("=")
+            if name not in weights or not value.isdigit():
+                raise CommandError(f"--weight không hợp lệ: {item}")
+            weights[name] = asked[name] = int(value)
+        if not admin_installed():
+            # profile api: orders.admin không import được
+            wanted = [op for op in ADMIN_OPS if asked.get(op)]
+            if wanted:
+                raise CommandError(f"django.contrib.admin chưa cài (DJANGO_PROFILE=api?), không chạy được {', '.join(wanted)}")
+            self.stderr.write(f"django.contrib.admin chưa cài: bỏ qua {', '.join(ADMIN_OPS)}")
+
+        data = StressData(opts["products"], opts["stock"], opts["users"], opts["seed_orders"])
+        try:
+            report = run_stress(
+                threads=opts["threads"], duration=opts["duration"], max_ops=opts["ops"],
+                weights=weights, data=data,
+            )
+        finally:
+            if not opts["keep"] and hasattr(data, "staff"):  # setup chạy trong 1 transaction
+                data.teardown()
+        self._print(report)
+
+        if opts["keep"]:
+            self.stdout.write(f"giữ dữ liệu: sku stress-{report['run']}-*, user stress_{report['run']}_*")
+        if report["problems"]:
+            for line in report["problems"][:50]:
+                self.stderr.write(line)
+            raise CommandError(f"{len(report['problems'])} vi phạm bất biến tồn kho")
+        self.stdout.write(self.style.SUCCESS("Bất biến tồn kho OK"))
+
+    def _print(self, r):
+        w = self.stdout.write
+        w(f"run={r['run']} threads={r['threads']} {r['ops']} thao tác / {r['elapsed_s']:.1f}s = {r['ops_per_s']:.1f} ops/s")
+        w(f"{'op':<14}{'ok':>6}{'rej':>6}{'skip':>6}{'err':>6}{'gave':>6}{'p50ms':>9}{'p95ms':>9}{'maxms':>9}")
+        for op, s in r["per_op"].items():
+            w(f"{op:<14}{s['ok']:>6}{s['rejected']:>6}{s['skip']:>6}{s['error']:>6}{s['gave_up']:>6}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['max_ms']:>9.1f}")
+        w(f"lỗi khoá lọt ra ngoài (bỏ cuộc): {r['gave_up'] or 0}")
+        for (name, kind, outcome), n in sorted(r["lock_retries"].items()):
+            w(f"  db_retry {name}: {kind} {outcome} x{n}")
+        if r["innodb"] is not None:
+            w(f"InnoDB row lock waits: {r['innodb'].get('Innodb_row_lock_waits', 0)}, "
+              f"tổng thời gian chờ: {r['innodb'].get('Innodb_row_lock_time', 0)} ms")
+        w(f"trạng thái đơn cuối: {r['orders']}")
+        for e in r["errors"]:
+            self.stderr.write(f"lỗi: {e}")
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.25 on 2025-10-24 09:40
+
+from django.db import migrations, models
+
+
+def create_sequencer(apps, schema_editor):
+    # dòng khoá + seq lớn nhất đã gán của orders.outbox.sequence_events
+    apps.get_model("orders", "OutboxCursor").objects.get_or_create(name="__sequencer__")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_seq', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField()),
+                ('event_type', models.CharField(choices=[('created', 'created'), ('updated', 'updated'), ('paid', 'paid'), ('cancelled', 'cancelled'), ('refunded', 'refunded'), ('reopened', 'reopened'), ('deleted', 'deleted'), ('archived', 'archived')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('seq', models.BigIntegerField(null=True, unique=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user_id', 'seq'], name='order_event_user_seq_idx'), models.Index(fields=['created_at'], name='order_event_created_idx')],
+            },
+        ),
+        migrations.RunPython(create_sequencer, migrations.RunPython.noop),
+    ]
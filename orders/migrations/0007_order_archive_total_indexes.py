@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_total_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderarchive',
+            index=models.Index(fields=['user', '-total', '-id'], name='order_archive_user_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderarchive',
+            index=models.Index(fields=['-total', '-id'], name='order_archive_total_idx'),
+        ),
+    ]
@@ -14,6 +14,8 @@ class Order(models.Model):
         (STATUS_REFUNDED, "Refunded"),
         (STATUS_CANCELLED, "Cancelled"),
     ]
+    # đơn ở các trạng thái này đang giữ kho (stock đã trừ, sold_count đã cộng)
+    STOCK_HOLDING_STATUSES = (STATUS_PENDING, STATUS_PAID)
 
     user       = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     status     = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)  
@@ -23,6 +25,16 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     class Meta:
         ordering = ["-created_at"]
+        # phục vụ list của user / staff (lọc status, sort created_at/total) + admin changelist (-created_at, -id) không filesort
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            models.Index(fields=["status", "-created_at", "-id"], name="order_status_created_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_created_idx"),
+            models.Index(fields=["user", "status", "-created_at", "-id"], name="order_user_status_idx"),
+            # ?ordering=total / -total của API
+            models.Index(fields=["-total", "-id"], name="order_total_idx"),
+            models.Index(fields=["user", "-total", "-id"], name="order_user_total_idx"),
+        ]
 
     def __str__(self):
         return f"Order#{self.id} by {self.user.username}"
@@ -43,3 +55,101 @@ class OrderItem(models.Model):
     @property
     def subtotal(self):
         return self.quantity * self.unit_price
+
+
+# ----------------- Archive (đơn cũ đã cancelled/refunded, xem orders/archive.py) -----------------
+class ReadOnlyArchiveModel(models.Model):
+    """Ghi vào archive chỉ qua bulk_create trong orders.archive; save()/delete() từng dòng bị chặn."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        raise ValueError(f"{type(self).__name__} chỉ đọc")
+
+    def delete(self, *args, **kwargs):
+        raise ValueError(f"{type(self).__name__} chỉ đọc")
+
+
+class OrderArchive(ReadOnlyArchiveModel):
+    # giữ nguyên id của Order để link/đối soát cũ vẫn đúng
+    id         = models.BigIntegerField(primary_key=True)
+    user       = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_orders")
+    status     = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    note       = models.TextField(blank=True, default="")
+    total      = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="order_archive_user_idx"),
+            models.Index(fields=["-created_at", "-id"], name="order_archive_created_idx"),
+            # list ?include_archived=1 đọc từng bảng theo index rồi merge (OrderViewSet.list)
+            models.Index(fields=["user", "-total", "-id"], name="order_archive_user_total_idx"),
+            models.Index(fields=["-total", "-id"], name="order_archive_total_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order#{self.id} (archived)"
+
+
+class OrderItemArchive(ReadOnlyArchiveModel):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(OrderArchive, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name="archived_order_items")
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField()
+
+    @property
+    def subtotal(self):
+        return self.quantity * self.unit_price
+
+
+# ----------------- Outbox (orders/events.py ghi, relay_order_events đẩy đi) -----------------
+class OrderEvent(models.Model):
+    TYPE_CREATED   = "created"
+    TYPE_UPDATED   = "updated"
+    TYPE_PAID      = "paid"
+    TYPE_CANCELLED = "cancelled"
+    TYPE_REFUNDED  = "refunded"
+    TYPE_REOPENED  = "reopened"
+    TYPE_DELETED   = "deleted"
+    TYPE_ARCHIVED  = "archived"
+
+    TYPE_CHOICES = [(t, t) for t in (
+        TYPE_CREATED, TYPE_UPDATED, TYPE_PAID, TYPE_CANCELLED,
+        TYPE_REFUNDED, TYPE_REOPENED, TYPE_DELETED, TYPE_ARCHIVED,
+    )]
+
+    # không FK tới Order: đơn bị xoá/archive thì event vẫn còn
+    order_id   = models.BigIntegerField()
+    user_id    = models.BigIntegerField()
+    event_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    payload    = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # thứ tự theo lúc COMMIT (id/created_at là lúc INSERT): orders.outbox.sequence_events gán cho
+    # event đã commit, NULL = chưa gán. Là cursor của relay và /api/orders/changes/?since=
+    seq        = models.BigIntegerField(null=True, unique=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["user_id", "seq"], name="order_event_user_seq_idx"),
+            models.Index(fields=["created_at"], name="order_event_created_idx"),
+        ]
+
+
+class OutboxCursor(models.Model):
+    """
+    Vị trí (seq) đã relay tới của từng sink.
+    Dòng SEQUENCER (tên dành riêng) giữ seq lớn nhất đã gán và là khoá của sequence_events.
+    """
+    SEQUENCER = "__sequencer__"
+
+    name     = models.CharField(max_length=50, primary_key=True)
+    last_seq = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
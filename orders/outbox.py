@@ -0,0 +1,152 @@
+# orders/outbox.py
+"""
+Relay OrderEvent -> sink (file / webhook / queue trong process cho test).
+
+id và created_at của event được gán lúc INSERT, không phải lúc COMMIT: transaction chèn event
+rồi còn chờ khoá Product có thể commit sau cả event id lớn hơn. Vì vậy cursor không dùng id mà
+dùng `seq`, do sequence_events() gán cho các event ĐÃ commit (chưa commit thì chưa thấy -> lần
+gán sau nhận seq lớn hơn mọi seq đã phát). Các lần gán nối tiếp nhau nhờ khoá dòng SEQUENCER,
+nên seq tăng theo đúng thứ tự người đọc nhìn thấy -> không event nào bị cursor nhảy qua,
+không phụ thuộc đồng hồ máy nào. Gán sau commit của transaction ghi event (orders.events) và ở
+mỗi vòng relay; /api/orders/changes/ chỉ đọc.
+
+Mỗi sink có 1 OutboxCursor riêng; relay đọc seq > cursor, deliver NGOÀI transaction (không giữ
+khoá/connection trong lúc gọi webhook), xong mới tiến cursor (compare-and-set, không lùi)
+-> at-least-once, consumer tự bỏ trùng theo event id.
+"""
+import json
+import os
+import queue
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OrderEvent, OutboxCursor
+
+
+def serialize_event(e: OrderEvent) -> dict:
+    return {
+        "id": e.id,
+        "seq": e.seq,
+        "type": e.event_type,
+        "order": e.order_id,
+        "user": e.user_id,
+        "data": e.payload,
+        "at": e.created_at.isoformat(),
+    }
+
+
+def sequence_events(batch_size=1000) -> int:
+    """
+    Gán seq cho tối đa batch_size event đã commit mà chưa có seq. Trả số event đã gán.
+    Chờ (không skip_locked) khoá SEQUENCER: tiến trình đang giữ khoá có thể đã đọc xong trước khi
+    event của mình commit, bỏ qua thì event nằm chờ tới lần gán sau. Transaction này rất ngắn.
+    """
+    with transaction.atomic():
+        seq = OutboxCursor.objects.select_for_update().filter(name=OutboxCursor.SEQUENCER).first()
+        if seq is None:  # migrate 0005 tạo sẵn; phòng DB bị xoá tay
+            OutboxCursor.objects.get_or_create(name=OutboxCursor.SEQUENCER)
+            seq = OutboxCursor.objects.select_for_update().get(name=OutboxCursor.SEQUENCER)
+        events = list(OrderEvent.objects.filter(seq__isnull=True).order_by("id").only("id")[:batch_size])
+        if not events:
+            return 0
+        for e in events:
+            seq.last_seq += 1
+            e.seq = seq.last_seq
+        OrderEvent.objects.bulk_update(events, ["seq"])
+        seq.save(update_fields=["last_seq", "updated_at"])
+    return len(events)
+
+
+def sequenced_events(since=0):
+    """Event có seq > since, theo seq tăng dần."""
+    return OrderEvent.objects.filter(seq__gt=since).order_by("seq")
+
+
+# ----------------- Sinks -----------------
+class BaseSink:
+    def deliver(self, events):
+        """events: list dict (serialize_event). Lỗi thì raise -> cursor không tiến."""
+        raise NotImplementedError
+
+
+class FileSink(BaseSink):
+    """Append NDJSON, fsync trước khi trả về."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def deliver(self, events):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for e in events:
+                f.write(json.dumps(e, cls=DjangoJSONEncoder) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class WebhookSink(BaseSink):
+    """POST cả batch dạng {"events": [...]}; không phải 2xx thì coi là lỗi."""
+
+    def __init__(self, url, timeout=10, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def deliver(self, events):
+        body = json.dumps({"events": events}, cls=DjangoJSONEncoder).encode()
+        req = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            if not 200 <= resp.status < 300:
+                raise RuntimeError(f"webhook trả {resp.status}")
+
+
+class MemorySink(BaseSink):
+    """Queue trong process (dùng cho test)."""
+
+    queue = queue.Queue()
+
+    def deliver(self, events):
+        for e in events:
+            self.queue.put(e)
+
+
+def get_sink(name) -> BaseSink:
+    sinks = getattr(settings, "ORDER_EVENT_SINKS", {})
+    if name not in sinks:
+        raise KeyError(f"sink '{name}' chưa khai báo trong ORDER_EVENT_SINKS")
+    conf = sinks[name]
+    return import_string(conf["BACKEND"])(**conf.get("OPTIONS", {}))
+
+
+# ----------------- Relay -----------------
+def relay_batch(name, sink=None, batch_size=500):
+    """Đẩy 1 batch cho sink `name`. Trả số event đã gửi (0 = hết)."""
+    if name == OutboxCursor.SEQUENCER:
+        raise ValueError(f"'{name}' là tên dành riêng")
+    sink = sink or get_sink(name)
+    sequence_events(batch_size)
+    cursor, _ = OutboxCursor.objects.get_or_create(name=name)
+    events = list(sequenced_events(cursor.last_seq)[:batch_size])
+    if not events:
+        return 0
+    sink.deliver([serialize_event(e) for e in events])
+    # compare-and-set: 2 relay cùng tên chạy song song thì có thể gửi trùng (at-least-once)
+    # nhưng cursor chỉ tiến, không bao giờ lùi
+    OutboxCursor.objects.filter(name=name, last_seq__lt=events[-1].seq).update(
+        last_seq=events[-1].seq, updated_at=timezone.now()
+    )
+    return len(events)
+
+
+def prune_events(days):
+    """Xoá event cũ hơn `days` ngày mà mọi sink đã relay qua."""
+    cursors = OutboxCursor.objects.exclude(name=OutboxCursor.SEQUENCER).values_list("last_seq", flat=True)
+    min_cursor = min(cursors, default=0)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OrderEvent.objects.filter(seq__lte=min_cursor, created_at__lt=cutoff).delete()
+    return deleted
@@ -1,10 +1,16 @@
+from decimal import Decimal
+
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 from django.db import transaction
 from django.db.models import F
 from django.db.models.functions import Greatest
 
-from .models import Order, OrderItem
+from .models import Order, OrderArchive, OrderEvent, OrderItem
+from .events import record_order_event
 from products.models import Product
+from products.pricing import get_prices, get_prices_with_stock
+from common.db_retry import retry_on_lock_error
 
 ALLOWED_TRANSITIONS = {
     "pending": {"paid", "cancelled"},
@@ -13,7 +19,51 @@ ALLOWED_TRANSITIONS = {
     "cancelled": {"pending"}, 
 }
 
+# checkout chỉ cần chừng này cột của Product
+CHECKOUT_PRODUCT_FIELDS = ("id", "name", "price", "stock")
+
+
+def price_lines(lines, products):
+    """
+    Tính giá + kiểm tồn cho giỏ. lines: [(product_id, qty)], products: {id: obj có name/price/stock}.
+    Dùng chung cho checkout (Product đã khoá) và /orders/quote/ (StockedPriceRow từ snapshot giá,
+    stock đọc DB không khoá) -> cùng 1 cách tính.
+    Trả (rows, total); row["detail"] có giá trị khi dòng đó không đặt được.
+    """
+    rows, total = [], Decimal("0")
+    for pid, qty in lines:
+        p = products.get(pid)
+        row = {"product": pid, "quantity": qty, "detail": None}
+        if p is None:
+            row["detail"] = f"product={pid} không tồn tại"
+        else:
+            row.update(product_name=p.name, unit_price=p.price, subtotal=p.price * qty)
+            total += row["subtotal"]
+            if p.stock < qty:
+                row["detail"] = f"Sản phẩm '{p.name}' không đủ tồn (còn {p.stock}, cần {qty})."
+        row["available"] = row["detail"] is None
+        rows.append(row)
+    return rows, total
+
+
+def _check_unique_products(pids):
+    if len(set(pids)) != len(pids):
+        raise serializers.ValidationError("Mỗi sản phẩm chỉ được 1 dòng")
+
+
+class ProductPKField(serializers.PrimaryKeyRelatedField):
+    """Nhận pk sản phẩm nhưng không query từng dòng; OrderSerializer kiểm tra cả giỏ trong 1 lần."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = ProductPKField(queryset=Product.objects.all())
     product_name = serializers.CharField(source="product.name", read_only=True)
     subtotal = serializers.SerializerMethodField(read_only=True)
 
@@ -41,91 +91,145 @@ class OrderSerializer(serializers.ModelSerializer):
     def get_allowed_transitions(self, obj):
         return sorted(list(ALLOWED_TRANSITIONS.get(obj.status, set())))
 
-    # ---------- helpers ----------
-    def _prod(self, raw) -> Product:
-        if isinstance(raw, Product):
-            return raw
-        try:
-            return Product.objects.get(pk=raw)
-        except Product.DoesNotExist:
-            raise serializers.ValidationError({"items": [f"product={raw} không tồn tại"]})
+    def validate_items(self, items):
+        pids = [it["product"] for it in items]
+        _check_unique_products(pids)
+        # snapshot giá trong RAM: giỏ hợp lệ thì không tốn query nào ở bước này
+        missing = set(pids) - get_prices(pids).keys()
+        if missing:
+            raise serializers.ValidationError([f"product={pid} không tồn tại" for pid in sorted(missing)])
+        return items
 
+    # ---------- helpers ----------
     def _qty(self, it) -> int:
         q = int(it.get("quantity", 1))
         if q <= 0:
             raise serializers.ValidationError({"items": ["quantity phải > 0"]})
         return q
 
-    def _recalc_total(self, order: Order):
-        total = sum(item.subtotal for item in order.items.all())
-        order.total = total
-        order.save(update_fields=["total"])
-        return order
+    def _lock_products(self, pids) -> dict:
+        """1 query cho cả giỏ, khoá theo thứ tự id -> 2 checkout trùng sản phẩm không deadlock nhau."""
+        return (
+            Product.objects.select_for_update()
+            .only(*CHECKOUT_PRODUCT_FIELDS)
+            .order_by("id")
+            .in_bulk(pids)
+        )
 
-    @transaction.atomic
-    def _reserve_stock(self, product: Product, qty: int):
-        p = Product.objects.select_for_update().get(pk=product.pk)
-        if p.stock < qty:
-            raise serializers.ValidationError(
-                {"items": [f"Sản phẩm '{p.name}' không đủ tồn (còn {p.stock}, cần {qty})."]}
+    def _create_items(self, order: Order, items_data):
+        """Giữ kho + tạo OrderItem (giá lấy từ dòng Product đã khoá) + tính total."""
+        lines = [(it["product"], self._qty(it)) for it in items_data]
+        products = self._lock_products([pid for pid, _ in lines])
+
+        rows, total = price_lines(lines, products)
+        errors = [r["detail"] for r in rows if not r["available"]]
+        if errors:
+            raise serializers.ValidationError({"items": errors})
+
+        for pid, qty in lines:
+            Product.objects.filter(pk=pid).update(
+                stock=F("stock") - qty,
+                sold_count=F("sold_count") + qty,
             )
-        Product.objects.filter(pk=p.pk).update(
-            stock=F("stock") - qty,
-            sold_count=F("sold_count") + qty,
-        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=pid, quantity=qty, unit_price=products[pid].price)
+            for pid, qty in lines
+        ])
+        order.total = total
+        order.save(update_fields=["total"])
 
-    @transaction.atomic
-    def _release_stock(self, product: Product, qty: int):
-        Product.objects.filter(pk=product.pk).update(
+    def _release_stock(self, product_id: int, qty: int):
+        Product.objects.filter(pk=product_id).update(
             stock=F("stock") + qty,
             sold_count=Greatest(F("sold_count") - qty, 0),
         )
 
     # ---------- create/update ----------
+    # retry ngoài atomic: deadlock/lock timeout thì chạy lại cả transaction -> không được sửa validated_data
+    @retry_on_lock_error
     @transaction.atomic
     def create(self, validated_data):
+        validated_data = dict(validated_data)
         items_data = validated_data.pop("items", [])
         request = self.context.get("request")
         order = Order.objects.create(user=request.user, **validated_data)
-
-        for it in items_data:
-            product = self._prod(it["product"])
-            qty = self._qty(it)
-            self._reserve_stock(product, qty)
-
-        for it in items_data:
-            product = self._prod(it["product"])
-            qty = self._qty(it)
-            OrderItem.objects.create(
-                order=order, product=product, quantity=qty, unit_price=product.price
-            )
-
-        self._recalc_total(order)
+        self._create_items(order, items_data)
+        record_order_event(order, OrderEvent.TYPE_CREATED)
         return order
 
+    @retry_on_lock_error
     @transaction.atomic
     def update(self, instance, validated_data):
+        validated_data = dict(validated_data)
         items_data = validated_data.pop("items", None)
 
+        if items_data is not None:
+            # khoá đơn + đọc lại status: sửa items đồng thời với cancel/refund không trả kho 2 lần
+            status = Order.objects.select_for_update().filter(pk=instance.pk).values_list("status", flat=True).first()
+            if status is None:
+                raise NotFound()
+            if status != Order.STATUS_PENDING:
+                raise serializers.ValidationError({"items": ["Chỉ sửa items khi đơn đang pending"]})
+            instance.status = status
+
         for attr, val in validated_data.items():
             setattr(instance, attr, val)
-        instance.save()
+        # chỉ ghi field được sửa: instance đọc trước khi khoá, ghi cả dòng sẽ đè status mới
+        instance.save(update_fields=[*validated_data, "updated_at"])
 
         if items_data is not None:
-            for oi in list(instance.items.select_related("product")):
-                self._release_stock(oi.product, oi.quantity)
-            instance.items.all().delete()
-
-            for it in items_data:
-                product = self._prod(it["product"])
-                qty = self._qty(it)
-                self._reserve_stock(product, qty)
-            for it in items_data:
-                product = self._prod(it["product"])
-                qty = self._qty(it)
-                OrderItem.objects.create(
-                    order=instance, product=product, quantity=qty, unit_price=product.price
-                )
-
-        self._recalc_total(instance)
+            for oi in OrderItem.objects.filter(order_id=instance.pk):
+                self._release_stock(oi.product_id, oi.quantity)
+            OrderItem.objects.filter(order_id=instance.pk).delete()
+            self._create_items(instance, items_data)
+
+        record_order_event(instance, OrderEvent.TYPE_UPDATED)
         return instance
+
+
+class OrderArchiveSerializer(OrderSerializer):
+    """Đơn đã archive: cùng shape OrderSerializer (+ archived_at), chỉ đọc, không còn transition nào."""
+
+    class Meta(OrderSerializer.Meta):
+        model = OrderArchive
+        fields = OrderSerializer.Meta.fields + ("archived_at",)
+        read_only_fields = fields
+
+    def get_allowed_transitions(self, obj):
+        return []
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source="event_type")
+    order = serializers.IntegerField(source="order_id")
+    data = serializers.JSONField(source="payload")
+    at = serializers.DateTimeField(source="created_at")
+
+    class Meta:
+        model = OrderEvent
+        fields = ("id", "seq", "type", "order", "data", "at")
+
+
+class QuoteLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class QuoteSerializer(serializers.Serializer):
+    """Input của POST /api/orders/quote/: {"items": [{"product", "quantity"}, ...]}."""
+    items = QuoteLineSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        _check_unique_products([it["product"] for it in items])
+        return items
+
+    def quote(self):
+        lines = [(it["product"], it["quantity"]) for it in self.validated_data["items"]]
+        # giá/tên từ snapshot giá, stock đọc DB; không select_for_update
+        products = get_prices_with_stock([pid for pid, _ in lines])
+        rows, total = price_lines(lines, products)
+        for r in rows:
+            for f in ("unit_price", "subtotal"):
+                if f in r:
+                    r[f] = str(r[f])
+        return {"items": rows, "total": str(total), "available": all(r["available"] for r in rows)}
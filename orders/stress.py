@@ -0,0 +1,408 @@
+# orders/stress.py
+"""
+Stress test bất biến tồn kho khi nhiều luồng chạy đồng thời mọi đường đụng kho của đơn hàng
+(command stress_inventory). Chỉ làm việc trên dữ liệu của chính lần chạy (sku "stress-<run>-*",
+user "stress_<run>_*"), xong thì dọn (trừ khi keep=True).
+
+Bất biến kiểm sau khi chạy, cho từng sản phẩm:
+- stock + sold_count == stock ban đầu (không mất/không đẻ kho)
+- sold_count == tổng quantity của các đơn đang giữ kho (Order.STOCK_HOLDING_STATUSES)
+và cho từng đơn: total == sum(quantity * unit_price).
+
+Thao tác admin_* chỉ chạy khi django.contrib.admin được cài (profile api mặc định không có admin).
+"""
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.exceptions import PermissionDenied
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Sum
+from django.forms import inlineformset_factory
+from django.test import RequestFactory
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from common.db_retry import lock_error_kind, retry_stats
+from products.models import Product
+from users.models import User
+
+from .models import Order, OrderEvent, OrderItem
+from .views import OrderViewSet
+
+DEFAULT_WEIGHTS = {
+    "create": 30,
+    "update": 8,
+    "pay": 10,
+    "cancel": 10,
+    "refund": 6,
+    "reopen": 6,
+    "destroy": 4,
+    "admin_cancel": 4,
+    "admin_refund": 3,
+    "admin_reopen": 3,
+    "admin_formset": 6,
+    "admin_delete": 2,
+}
+ADMIN_OPS = tuple(op for op in DEFAULT_WEIGHTS if op.startswith("admin_"))
+
+
+def admin_installed() -> bool:
+    return apps.is_installed("django.contrib.admin")
+
+def innodb_lock_status():
+    """Innodb_row_lock_waits / Innodb_row_lock_time (ms) toàn server; None nếu không phải MySQL."""
+    if connection.vendor != "mysql":
+        return None
+    with connection.cursor() as cur:
+        cur.execute("SHOW GLOBAL STATUS WHERE Variable_name IN ('Innodb_row_lock_waits', 'Innodb_row_lock_time')")
+        return {name: int(value) for name, value in cur.fetchall()}
+
+
+# ----------------- Dữ liệu của 1 lần chạy -----------------
+class StressData:
+    def __init__(self, products=10, stock=200, users=8, seed_orders=40):
+        self.run = uuid.uuid4().hex[:8]
+        self.n_products, self.stock, self.n_users, self.seed_orders = products, stock, users, seed_orders
+
+    @transaction.atomic
+    def setup(self):
+        self.products = Product.objects.bulk_create([
+            Product(sku=f"stress-{self.run}-{i}", name=f"stress {self.run} #{i}",
+                    price=Decimal(random.randint(100, 99900)) / 100, stock=self.stock)
+            for i in range(self.n_products)
+        ])
+        self.product_ids = [p.id for p in self.products]
+        # phone unique, tối đa 11 số: "0" + 6 số theo run + 4 số thứ tự
+        prefix = f"0{int(self.run, 16) % 10**6:06d}"
+        self.users = [
+            User.objects.create(username=f"stress_{self.run}_{i}", phone=f"{prefix}{i:04d}")
+            for i in range(self.n_users)
+        ]
+        self.staff = User.objects.create(
+            username=f"stress_{self.run}_staff", phone=f"{prefix}9999", is_staff=True, is_superuser=True,
+        )
+
+    def orders(self):
+        return Order.objects.filter(user__in=self.users)
+
+    def teardown(self):
+        order_ids = list(self.orders().values_list("id", flat=True))
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+        OrderEvent.objects.filter(order_id__in=order_ids).delete()
+        Product.objects.filter(id__in=self.product_ids).delete()
+        User.objects.filter(id__in=[u.id for u in [*self.users, self.staff]]).delete()
+
+    # ----------------- Bất biến -----------------
+    def check(self):
+        """Danh sách vi phạm (rỗng = OK)."""
+        problems = []
+        held = dict(
+            OrderItem.objects.filter(order__in=self.orders(), order__status__in=Order.STOCK_HOLDING_STATUSES)
+            .values_list("product_id").annotate(q=Sum("quantity")).values_list("product_id", "q")
+        )
+        for p in Product.objects.filter(id__in=self.product_ids).order_by("id"):
+            if p.stock + p.sold_count != self.stock:
+                problems.append(f"product={p.id}: stock {p.stock} + sold_count {p.sold_count} != {self.stock}")
+            if p.sold_count != held.get(p.id, 0):
+                problems.append(f"product={p.id}: sold_count {p.sold_count} != đang giữ {held.get(p.id, 0)}")
+        for o in self.orders().prefetch_related("items"):
+            expected = sum((it.quantity * it.unit_price for it in o.items.all()), Decimal("0"))
+            if o.total != expected:
+                problems.append(f"order={o.id}: total {o.total} != {expected}")
+        return problems
+
+
+# ----------------- Các thao tác -----------------
+def _order_admin():
+    """(orders.admin, OrderAdmin không gửi message). Import muộn: orders.admin cần admin đã cài."""
+    from django.contrib.admin.sites import site
+
+    from . import admin
+
+    class _QuietOrderAdmin(admin.OrderAdmin):
+        def message_user(self, *args, **kwargs):
+            pass
+
+    return admin, _QuietOrderAdmin(Order, site)
+
+
+def _view(actions, **initkwargs):
+    # không throttle: đo lock chứ không đo rate limit
+    return OrderViewSet.as_view(actions, throttle_classes=[], **initkwargs)
+
+
+class Operations:
+    """Mỗi thao tác đi qua đúng code của API/admin; trả mã HTTP (hoặc 200/409 cho admin)."""
+
+    def __init__(self, data: StressData):
+        self.data = data
+        self.api = APIRequestFactory()
+        self.admin_module, self.admin = _order_admin() if admin_installed() else (None, None)
+        self.rf = RequestFactory()
+        self.views = {
+            "create": _view({"post": "create"}),
+            "update": _view({"patch": "partial_update"}),
+            "destroy": _view({"delete": "destroy"}),
+            **{name: _view({"post": name}) for name in ("pay", "cancel", "refund", "reopen")},
+        }
+        self.formset_class = inlineformset_factory(
+            Order, OrderItem, fields=("product", "quantity", "unit_price"), can_delete=True, extra=1
+        )
+
+    # ---- chọn ngẫu nhiên ----
+    def _cart(self):
+        pids = random.sample(self.data.product_ids, random.randint(1, min(3, len(self.data.product_ids))))
+        return [{"product": pid, "quantity": random.randint(1, 3)} for pid in pids]
+
+    def _order(self, statuses=None):
+        qs = self.data.orders()
+        if statuses:
+            qs = qs.filter(status__in=statuses)
+        ids = list(qs.values_list("id", "user_id")[:200])
+        return random.choice(ids) if ids else (None, None)
+
+    def _admin_request(self):
+        request = self.rf.post("/admin/orders/order/")
+        request.user = self.data.staff
+        return request
+
+    def _call(self, name, method, path, user, pk=None, body=None):
+        request = getattr(self.api, method)(path, body, format="json")
+        force_authenticate(request, user=user)
+        kwargs = {"pk": pk} if pk is not None else {}
+        return self.views[name](request, **kwargs).status_code
+
+    # ---- API ----
+    def create(self):
+        user = random.choice(self.data.users)
+        return self._call("create", "post", "/api/orders/", user, body={"note": "stress", "items": self._cart()})
+
+    def update(self):
+        pk, user_id = self._order([Order.STATUS_PENDING])
+        if pk is None:
+            return None
+        user = next(u for u in self.data.users if u.id == user_id)
+        return self._call("update", "patch", f"/api/orders/{pk}/", user, pk, {"items": self._cart()})
+
+    def _transition(self, name, statuses, staff=False):
+        pk, user_id = self._order(statuses)
+        if pk is None:
+            return None
+        user = self.data.staff if staff else next(u for u in self.data.users if u.id == user_id)
+        return self._call(name, "post", f"/api/orders/{pk}/{name}/", user, pk)
+
+    def pay(self):
+        return self._transition("pay", [Order.STATUS_PENDING])
+
+    def cancel(self):
+        return self._transition("cancel", [Order.STATUS_PENDING])
+
+    def refund(self):
+        return self._transition("refund", [Order.STATUS_PAID])
+
+    def reopen(self):
+        return self._transition("reopen", [Order.STATUS_CANCELLED, Order.STATUS_REFUNDED], staff=True)
+
+    def destroy(self):
+        pk, user_id = self._order()
+        if pk is None:
+            return None
+        user = next(u for u in self.data.users if u.id == user_id)
+        return self._call("destroy", "delete", f"/api/orders/{pk}/", user, pk)
+
+    # ---- admin ----
+    def _admin_action(self, action, statuses):
+        ids = list(self.data.orders().filter(status__in=statuses).values_list("id", flat=True)[:200])
+        if not ids:
+            return None
+        action(self.admin, self._admin_request(), Order.objects.filter(id__in=random.sample(ids, min(3, len(ids)))))
+        return 200
+
+    def admin_cancel(self):
+        return self._admin_action(self.admin_module.action_cancel, [Order.STATUS_PENDING])
+
+    def admin_refund(self):
+        return self._admin_action(self.admin_module.action_refund, [Order.STATUS_PAID])
+
+    def admin_reopen(self):
+        return self._admin_action(self.admin_module.action_reopen, [Order.STATUS_CANCELLED, Order.STATUS_REFUNDED])
+
+    def admin_delete(self):
+        ids = list(self.data.orders().values_list("id", flat=True)[:200])
+        if not ids:
+            return None
+        self.admin.delete_queryset(self._admin_request(), Order.objects.filter(id__in=random.sample(ids, min(2, len(ids)))))
+        return 200
+
+    def admin_formset(self):
+        """Giống submit trang chi tiết đơn: đổi số lượng / xoá 1 dòng / thêm 1 sản phẩm mới."""
+        pk, _ = self._order([Order.STATUS_PENDING])
+        if pk is None:
+            return None
+        order = Order.objects.get(pk=pk)
+        items = list(order.items.all())
+        used = {it.product_id for it in items}
+        free = [pid for pid in self.data.product_ids if pid not in used]
+        prefix = self.formset_class.get_default_prefix()
+        post = {f"{prefix}-TOTAL_FORMS": str(len(items)), f"{prefix}-INITIAL_FORMS": str(len(items))}
+        for i, it in enumerate(items):
+            post.update({
+                f"{prefix}-{i}-id": str(it.id), f"{prefix}-{i}-order": str(pk),
+                f"{prefix}-{i}-product": str(it.product_id),
+                f"{prefix}-{i}-quantity": str(random.randint(1, 4)),
+                f"{prefix}-{i}-unit_price": str(it.unit_price),
+            })
+            if len(items) > 1 and random.random() < 0.2:
+                post[f"{prefix}-{i}-DELETE"] = "on"
+        if free and random.random() < 0.5:
+            n = len(items)
+            pid = random.choice(free)
+            product = next(p for p in self.data.products if p.id == pid)
+            post[f"{prefix}-TOTAL_FORMS"] = str(n + 1)
+            post.update({
+                f"{prefix}-{n}-order": str(pk), f"{prefix}-{n}-product": str(product.id),
+                f"{prefix}-{n}-quantity": str(random.randint(1, 3)), f"{prefix}-{n}-unit_price": str(product.price),
+            })
+        formset = self.formset_class(post, instance=order, prefix=prefix)
+        if not formset.is_valid():
+            return 400
+
+        class _Form:  # save_formset chỉ dùng form.instance
+            instance = order
+
+        # admin changeform_view cũng bọc save trong 1 transaction; PermissionDenied -> admin trả 403
+        try:
+            with transaction.atomic():
+                self.admin.save_formset(self._admin_request(), _Form, formset, change=True)
+        except PermissionDenied:
+            return 403
+        return 200
+
+
+# ----------------- Runner -----------------
+class StressResult:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ops = Counter()          # (op, kết quả) -> số lần
+        self.latency = defaultdict(list)
+        self.gave_up = Counter()      # lỗi khoá lọt qua retry_on_lock_error (client sẽ thấy 500)
+        self.errors = []              # lỗi khác (500, exception)
+
+    def add(self, op, outcome, ms):
+        with self.lock:
+            self.ops[op, outcome] += 1
+            self.latency[op].append(ms)
+
+    def error(self, message):
+        with self.lock:
+            if len(self.errors) < 20:
+                self.errors.append(message)
+
+
+def _outcome(status):
+    if status is None:
+        return "skip"
+    if status < 400:
+        return "ok"
+    if status < 500:
+        return "rejected"
+    return "error"
+
+
+def _worker(ops: Operations, weights, deadline, max_ops, counter, result: StressResult):
+    names = list(weights)
+    w = [weights[n] for n in names]
+    try:
+        while time.monotonic() < deadline:
+            with result.lock:
+                if max_ops is not None and counter[0] >= max_ops:
+                    return
+                counter[0] += 1
+            op = random.choices(names, w)[0]
+            start = time.perf_counter()
+            try:
+                status = getattr(ops, op)()
+                outcome = _outcome(status)
+                if outcome == "error":
+                    result.error(f"{op}: HTTP {status}")
+            except Exception as exc:
+                # retry nằm trong code được test (common.db_retry); tới đây là đã bỏ cuộc
+                kind = lock_error_kind(exc)
+                if kind:
+                    outcome = "gave_up"
+                    with result.lock:
+                        result.gave_up[kind] += 1
+                else:
+                    outcome = "error"
+                    result.error(f"{op}: {type(exc).__name__}: {exc}")
+            result.add(op, outcome, (time.perf_counter() - start) * 1000)
+    finally:
+        close_old_connections()
+        connection.close()
+
+
+def run_stress(threads=8, duration=10.0, max_ops=None, weights=None, data=None):
+    """
+    Chạy `threads` luồng tới khi hết `duration` giây (hoặc đủ `max_ops` thao tác).
+    Trả dict báo cáo; report["problems"] rỗng = bất biến giữ nguyên.
+    """
+    weights = {k: v for k, v in (weights or DEFAULT_WEIGHTS).items() if v > 0}
+    if not admin_installed():
+        weights = {k: v for k, v in weights.items() if k not in ADMIN_OPS}
+    data = data or StressData()
+    data.setup()
+    ops = Operations(data)
+    for _ in range(data.seed_orders):
+        ops.create()
+
+    result = StressResult()
+    counter = [0]
+    lock_before = innodb_lock_status()
+    retries_before = retry_stats()
+    started = time.perf_counter()
+    deadline = time.monotonic() + duration
+    workers = [
+        threading.Thread(target=_worker, args=(ops, weights, deadline, max_ops, counter, result))
+        for _ in range(threads)
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    lock_after = innodb_lock_status()
+
+    report = {
+        "run": data.run,
+        "threads": threads,
+        "elapsed_s": elapsed,
+        "ops": sum(result.ops.values()),
+        "ops_per_s": sum(result.ops.values()) / elapsed if elapsed else 0,
+        "per_op": {},
+        # {(hàm, deadlock|lock_wait, retry|gave_up): n} do common.db_retry đếm trong lúc chạy
+        "lock_retries": {
+            k: n - retries_before.get(k, 0) for k, n in retry_stats().items() if n != retries_before.get(k, 0)
+        },
+        "gave_up": dict(result.gave_up),
+        "errors": result.errors,
+        "innodb": (
+            {k: lock_after[k] - lock_before.get(k, 0) for k in lock_after} if lock_after is not None else None
+        ),
+        "problems": data.check(),
+        "orders": dict(Counter(data.orders().values_list("status", flat=True))),
+        "data": data,
+    }
+    for op in weights:
+        lat = sorted(result.latency.get(op, []))
+        report["per_op"][op] = {
+            **{k: result.ops[op, k] for k in ("ok", "rejected", "skip", "error", "gave_up")},
+            "p50_ms": lat[len(lat) // 2] if lat else 0,
+            "p95_ms": lat[int(len(lat) * 0.95)] if lat else 0,
+            "max_ms": lat[-1] if lat else 0,
+        }
+    return report
@@ -1,3 +1,542 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.db import OperationalError, connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from common.db_retry import lock_retry, retry_stats, run_with_retry
+from common.query_plan import analyze, plan_problems
+from products.models import Product
+from products.pricing import bump_price_version
+from users.models import User
+from .archive import archive_orders, retention_cutoff
+from .models import Order, OrderArchive, OrderEvent, OrderItem, OrderItemArchive, OutboxCursor
+from .events import record_order_event
+from .outbox import BaseSink, prune_events, relay_batch, sequence_events
+from .views import OrderViewSet, _MergedOrderKeys
+
+
+class OrderQueryPlanTests(TestCase):
+    """Các query list đơn hàng (API + admin) phải đi theo index, không full scan / filesort."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            [User(username=f"u{i}", phone=f"09{i:08d}") for i in range(10)]
+        )
+        cls.user = users[0]
+        cls.staff = User.objects.create(
+            username="staff", phone="0999999999", is_staff=True, is_superuser=True
+        )
+        statuses = [s for s, _ in Order.STATUS_CHOICES]
+        Order.objects.bulk_create(
+            [Order(user=users[i % 10], status=statuses[i % 4]) for i in range(400)]
+        )
+        OrderArchive.objects.bulk_create([
+            OrderArchive(id=10_000 + i, user=users[i % 10], status=Order.STATUS_CANCELLED,
+                         created_at=timezone.now(), updated_at=timezone.now())
+            for i in range(400)
+        ])
+        analyze(Order, OrderArchive, User)
+
+    def api_list_qs(self, user, params=None):
+        request = Request(APIRequestFactory().get("/api/orders/", params or {}))
+        request.user = user
+        view = OrderViewSet(request=request, format_kwarg=None, action="list", args=(), kwargs={})
+        # PageNumberPagination luôn cắt LIMIT
+        return view.filter_queryset(view.get_queryset())[:20]
+
+    def archive_branch_qs(self, user, params=None):
+        """2 nhánh (đơn nóng, archive) mà list ?include_archived=1 đọc cho trang đầu."""
+        request = Request(APIRequestFactory().get("/api/orders/", {"include_archived": 1, **(params or {})}))
+        request.user = user
+        view = OrderViewSet(request=request, format_kwarg=None, action="list", args=(), kwargs={})
+        hot = view.filter_queryset(view.get_queryset())
+        merged = _MergedOrderKeys(
+            hot, view.filter_queryset(view.get_archive_queryset()), hot.query.order_by or Order._meta.ordering
+        )
+        return [qs[:20] for qs, _ in merged.branches]
+
+    def admin_changelist_qs(self, params=None):
+        request = RequestFactory().get("/admin/orders/order/", params or {})
+        request.user = self.staff
+        cl = admin.site._registry[Order].get_changelist_instance(request)
+        return cl.queryset[: cl.list_per_page]
+
+    def assertGoodPlan(self, qs):
+        self.assertEqual(plan_problems(qs), [], msg=str(qs.query))
+
+    def test_owner_list(self):
+        self.assertGoodPlan(self.api_list_qs(self.user))
+
+    def test_owner_list_filter_status(self):
+        self.assertGoodPlan(self.api_list_qs(self.user, {"status": "paid"}))
+
+    def test_owner_list_ordering_created_at(self):
+        self.assertGoodPlan(self.api_list_qs(self.user, {"ordering": "created_at"}))
+
+    def test_owner_list_ordering_total(self):
+        for ordering in ("total", "-total"):
+            with self.subTest(ordering=ordering):
+                self.assertGoodPlan(self.api_list_qs(self.user, {"ordering": ordering}))
+
+    def test_staff_list(self):
+        self.assertGoodPlan(self.api_list_qs(self.staff))
+
+    def test_staff_list_ordering_fields(self):
+        # mọi cột trong OrderViewSet.ordering_fields, 2 chiều
+        for field in OrderViewSet.ordering_fields:
+            for ordering in (field, f"-{field}"):
+                with self.subTest(ordering=ordering):
+                    self.assertGoodPlan(self.api_list_qs(self.staff, {"ordering": ordering}))
+
+    def test_staff_list_filter_status(self):
+        self.assertGoodPlan(self.api_list_qs(self.staff, {"status": "pending"}))
+
+    def test_include_archived_branches(self):
+        for user in (self.user, self.staff):
+            for ordering in (None, "created_at", "total", "-total"):
+                params = {"ordering": ordering} if ordering else {}
+                for qs in self.archive_branch_qs(user, params):
+                    with self.subTest(user=user.username, ordering=ordering, table=qs.model.__name__):
+                        self.assertGoodPlan(qs)
+
+    def test_admin_changelist(self):
+        self.assertGoodPlan(self.admin_changelist_qs())
+
+    def test_admin_changelist_filter_status(self):
+        self.assertGoodPlan(self.admin_changelist_qs({"status__exact": "refunded"}))
+
+
+class NoThrottleMixin:
+    """Rate limit (LocMemBucketStore) sống qua các test -> tắt cho test nghiệp vụ."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(OrderViewSet, "throttle_classes", [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class OrderArchiveTests(NoThrottleMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="buyer", phone="0900000001")
+        cls.other = User.objects.create(username="other", phone="0900000002")
+        cls.product = Product.objects.create(name="p", price=Decimal("10.00"), stock=100)
+        old = timezone.now() - timedelta(days=400)
+
+        def order(user, status, created_at=None, qty=1):
+            o = Order.objects.create(user=user, status=status, total=Decimal("10.00") * qty)
+            OrderItem.objects.create(order=o, product=cls.product, quantity=qty, unit_price=Decimal("10.00"))
+            if created_at:
+                Order.objects.filter(pk=o.pk).update(created_at=created_at)
+            return o
+
+        cls.old_cancelled = order(cls.user, Order.STATUS_CANCELLED, old, qty=2)
+        cls.old_refunded = order(cls.user, Order.STATUS_REFUNDED, old - timedelta(days=1))
+        cls.old_pending = order(cls.user, Order.STATUS_PENDING, old)
+        cls.new_cancelled = order(cls.user, Order.STATUS_CANCELLED)
+        cls.other_old = order(cls.other, Order.STATUS_CANCELLED, old)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_archive_moves_only_finished_old_orders(self):
+        moved = archive_orders(before=retention_cutoff(365), batch_size=2)
+
+        self.assertEqual(moved, 3)
+        archived = {self.old_cancelled.pk, self.old_refunded.pk, self.other_old.pk}
+        self.assertEqual(set(OrderArchive.objects.values_list("id", flat=True)), archived)
+        self.assertFalse(Order.objects.filter(pk__in=archived).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id__in=archived).exists())
+        item = OrderItemArchive.objects.get(order_id=self.old_cancelled.pk)
+        self.assertEqual((item.product_id, item.quantity), (self.product.pk, 2))
+        self.assertEqual(
+            OrderEvent.objects.filter(event_type=OrderEvent.TYPE_ARCHIVED).count(), 3
+        )
+        # tồn kho đã trả lúc cancel/refund -> archive không đụng Product
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 100)
+
+    def test_archive_is_read_only(self):
+        archive_orders(before=retention_cutoff(365))
+        with self.assertRaises(ValueError):
+            OrderArchive.objects.get(pk=self.old_cancelled.pk).save()
+
+    def test_list_include_archived_merges_in_order(self):
+        archive_orders(before=retention_cutoff(365))
+
+        hot_only = self.client.get("/api/orders/").json()
+        self.assertEqual(
+            [o["id"] for o in hot_only["results"]], [self.new_cancelled.pk, self.old_pending.pk]
+        )
+
+        merged = self.client.get("/api/orders/", {"include_archived": 1}).json()
+        self.assertEqual(merged["count"], 4)  # không gồm đơn của user khác
+        self.assertEqual(
+            [o["id"] for o in merged["results"]],
+            [self.new_cancelled.pk, self.old_pending.pk, self.old_cancelled.pk, self.old_refunded.pk],
+        )
+        archived = merged["results"][2]
+        self.assertIn("archived_at", archived)
+        self.assertEqual(archived["allowed_transitions"], [])
+        self.assertEqual(archived["items"][0]["quantity"], 2)
+
+    def test_list_include_archived_filter_and_page(self):
+        archive_orders(before=retention_cutoff(365))
+        data = self.client.get(
+            "/api/orders/", {"include_archived": 1, "status": "cancelled", "ordering": "created_at"}
+        ).json()
+        self.assertEqual([o["id"] for o in data["results"]], [self.old_cancelled.pk, self.new_cancelled.pk])
+
+    def test_list_include_archived_pages_across_tables(self):
+        archive_orders(before=retention_cutoff(365))
+        expected = [self.new_cancelled.pk, self.old_pending.pk, self.old_cancelled.pk, self.old_refunded.pk]
+
+        class TwoPerPage(PageNumberPagination):
+            page_size = 2
+
+        with mock.patch.object(OrderViewSet, "pagination_class", TwoPerPage):
+            first = self.client.get("/api/orders/", {"include_archived": 1}).json()
+            with CaptureQueriesContext(connection) as ctx:
+                second = self.client.get("/api/orders/", {"include_archived": 1, "page": 2}).json()
+        self.assertEqual(first["count"], 4)
+        self.assertEqual([o["id"] for o in first["results"] + second["results"]], expected)
+        self.assertIsNone(second["next"])
+        # mỗi bảng 1 query ORDER BY ... LIMIT riêng, không UNION
+        keys = [q["sql"] for q in ctx.captured_queries if "LIMIT 4" in q["sql"]]
+        self.assertEqual(len(keys), 2)
+        self.assertFalse(any("UNION" in q["sql"] for q in ctx.captured_queries))
+
+    def test_retrieve_archived(self):
+        archive_orders(before=retention_cutoff(365))
+        url = f"/api/orders/{self.old_cancelled.pk}/"
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        resp = self.client.get(url, {"include_archived": 1})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["status"], Order.STATUS_CANCELLED)
+        # đơn archive của user khác vẫn không xem được
+        other_url = f"/api/orders/{self.other_old.pk}/"
+        self.assertEqual(self.client.get(other_url, {"include_archived": 1}).status_code, 404)
+
+
+class ListSink(BaseSink):
+    def __init__(self):
+        self.batches = []
+        self.depth = len(connection.atomic_blocks)  # TestCase tự bọc sẵn vài atomic
+
+    def deliver(self, events):
+        # deliver chạy ngoài transaction: không giữ khoá cursor trong lúc gọi mạng
+        assert len(connection.atomic_blocks) == self.depth
+        self.batches.append(events)
+
+    @property
+    def ids(self):
+        return [e["id"] for batch in self.batches for e in batch]
+
+
+class OrderOutboxTests(NoThrottleMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="buyer", phone="0900000001")
+        cls.other = User.objects.create(username="other", phone="0900000002")
+
+    def event(self, user=None, **kwargs):
+        user = user or self.user
+        return OrderEvent.objects.create(order_id=1, user_id=user.pk, event_type=OrderEvent.TYPE_CREATED, **kwargs)
+
+    def test_relay_delivers_in_batches_and_advances_cursor(self):
+        events = [self.event() for _ in range(5)]
+        sink = ListSink()
+
+        self.assertEqual(relay_batch("t", sink, batch_size=2), 2)
+        self.assertEqual(relay_batch("t", sink, batch_size=2), 2)
+        self.assertEqual(relay_batch("t", sink, batch_size=2), 1)
+        self.assertEqual(relay_batch("t", sink, batch_size=2), 0)
+        self.assertEqual(sink.ids, [e.pk for e in events])
+        self.assertEqual(OutboxCursor.objects.get(name="t").last_seq, OrderEvent.objects.get(pk=events[-1].pk).seq)
+
+    def test_late_commit_with_lower_id_is_not_skipped(self):
+        sink = ListSink()
+        placeholder = self.event()
+        later = self.event()
+        late_id = placeholder.pk
+        placeholder.delete()
+        relay_batch("t", sink)
+        # event INSERT trước (id nhỏ hơn) nhưng commit sau khi cursor đã qua id lớn hơn
+        late = self.event(id=late_id)
+
+        relay_batch("t", sink)
+        self.assertEqual(sink.ids, [later.pk, late.pk])
+        late.refresh_from_db()
+        self.assertGreater(late.seq, OrderEvent.objects.get(pk=later.pk).seq)
+
+    def test_cursor_never_moves_backwards(self):
+        self.event()
+        relay_batch("t", ListSink())
+        OutboxCursor.objects.filter(name="t").update(last_seq=10**9)
+        self.event()
+        relay_batch("t", ListSink())
+        self.assertEqual(OutboxCursor.objects.get(name="t").last_seq, 10**9)
+
+    def test_prune_keeps_unrelayed_events(self):
+        self.event()
+        relay_batch("t", ListSink())
+        pending = self.event()
+        OrderEvent.objects.update(created_at=timezone.now() - timedelta(days=60))
+
+        self.assertEqual(prune_events(30), 1)
+        self.assertEqual(list(OrderEvent.objects.values_list("id", flat=True)), [pending.pk])
+
+    def test_record_order_event_sequences_after_commit(self):
+        order = Order.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            event = record_order_event(order, OrderEvent.TYPE_CREATED)
+            event.refresh_from_db()
+            self.assertIsNone(event.seq)  # chưa commit thì chưa có seq
+        event.refresh_from_db()
+        self.assertIsNotNone(event.seq)
+
+    def test_changes_feed_is_read_only(self):
+        self.event()
+        sequence_events()
+        self.event()  # chưa gán seq -> chưa xuất hiện
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertNumQueries(1) as ctx:
+            page = client.get("/api/orders/changes/").json()
+        self.assertEqual(len(page["results"]), 1)
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertTrue(sql.startswith("SELECT") and "FOR UPDATE" not in sql, sql)
+
+    def test_changes_feed_pages_by_cursor_and_scopes_user(self):
+        mine = [self.event() for _ in range(3)]
+        self.event(user=self.other)
+        sequence_events()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        page = client.get("/api/orders/changes/", {"limit": 2}).json()
+        self.assertEqual([e["id"] for e in page["results"]], [e.pk for e in mine[:2]])
+        self.assertTrue(page["has_more"])
+        page = client.get("/api/orders/changes/", {"since": page["next_cursor"], "limit": 2}).json()
+        self.assertEqual([e["id"] for e in page["results"]], [mine[2].pk])
+        self.assertFalse(page["has_more"])
+        page = client.get("/api/orders/changes/", {"since": page["next_cursor"]}).json()
+        self.assertEqual(page["results"], [])
+
+    def test_changes_feed_clamps_and_validates_params(self):
+        self.event()
+        self.event()
+        sequence_events()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        resp = client.get("/api/orders/changes/", {"limit": -5})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()["results"]), 1)
+        self.assertEqual(client.get("/api/orders/changes/", {"since": "x"}).status_code, 400)
+
+
+class OrderQuoteTests(NoThrottleMixin, TestCase):
+    """/orders/quote/ phải cho cùng kết quả với checkout (price_lines dùng chung)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="buyer", phone="0900000001")
+        cls.a = Product.objects.create(name="a", price=Decimal("12.50"), stock=10)
+        cls.b = Product.objects.create(name="b", price=Decimal("3.99"), stock=2)
+
+    def setUp(self):
+        super().setUp()
+        bump_price_version()  # snapshot giá của test trước không được dùng lại
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cart(self, *lines):
+        return {"items": [{"product": p.pk, "quantity": q} for p, q in lines]}
+
+    def assertQuoteMatchesCheckout(self, cart):
+        quote = self.client.post("/api/orders/quote/", cart, format="json")
+        self.assertEqual(quote.status_code, 200)
+        quote = quote.json()
+        self.assertTrue(quote["available"])
+
+        resp = self.client.post("/api/orders/", cart, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        order = resp.json()
+        self.assertEqual(Decimal(quote["total"]), Decimal(order["total"]))
+        self.assertEqual(
+            [(r["product"], r["quantity"], Decimal(r["unit_price"]), Decimal(r["subtotal"])) for r in quote["items"]],
+            [(r["product"], r["quantity"], Decimal(r["unit_price"]), Decimal(r["subtotal"])) for r in order["items"]],
+        )
+
+    def test_quote_matches_checkout(self):
+        self.assertQuoteMatchesCheckout(self.cart((self.a, 3), (self.b, 2)))
+
+    @override_settings(PRICE_SNAPSHOT_ENABLED=True)
+    def test_quote_matches_checkout_with_snapshot(self):
+        cart = self.cart((self.a, 1), (self.b, 1))
+        self.client.post("/api/orders/quote/", cart, format="json")  # nạp snapshot
+        Product.objects.filter(pk=self.a.pk).update(price=Decimal("13.00"))
+        bump_price_version()  # như invalidate_prices sau commit
+        self.assertQuoteMatchesCheckout(cart)
+
+    def test_out_of_stock_quote_unavailable_checkout_rejected(self):
+        cart = self.cart((self.a, 1), (self.b, 3))
+
+        quote = self.client.post("/api/orders/quote/", cart, format="json").json()
+        self.assertFalse(quote["available"])
+        self.assertEqual([r["available"] for r in quote["items"]], [True, False])
+
+        resp = self.client.post("/api/orders/", cart, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["items"], [quote["items"][1]["detail"]])
+        self.assertEqual(Product.objects.get(pk=self.a.pk).stock, 10)
+
+    def test_duplicate_and_missing_products(self):
+        dup = self.cart((self.a, 1), (self.a, 2))
+        self.assertEqual(self.client.post("/api/orders/quote/", dup, format="json").status_code, 400)
+        self.assertEqual(self.client.post("/api/orders/", dup, format="json").status_code, 400)
+
+        cart = {"items": [{"product": self.a.pk, "quantity": 1}, {"product": 999999, "quantity": 1}]}
+        quote = self.client.post("/api/orders/quote/", cart, format="json").json()
+        self.assertFalse(quote["available"])
+        self.assertEqual(quote["items"][1]["detail"], "product=999999 không tồn tại")
+        self.assertEqual(self.client.post("/api/orders/", cart, format="json").status_code, 400)
+
+
+@override_settings(DB_RETRY_ATTEMPTS=3, DB_RETRY_LOCK_WAIT=False)
+class DbRetryTests(SimpleTestCase):
+    """common.db_retry: SimpleTestCase để không có sẵn transaction bao ngoài như TestCase."""
+
+    def setUp(self):
+        patcher = mock.patch("common.db_retry.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.signals = []
+
+        def receiver(sender, name, kind, outcome, attempt, **kwargs):
+            self.signals.append((name, kind, outcome, attempt))
+        lock_retry.connect(receiver, weak=False)
+        self.addCleanup(lock_retry.disconnect, receiver)
+
+    def flaky(self, *errors):
+        """Hàm raise lần lượt errors rồi trả "ok"; đếm số lần gọi ở .calls."""
+        errors = list(errors)
+
+        def func():
+            func.calls += 1
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+        func.calls = 0
+        return func
+
+    def test_retries_deadlock_then_succeeds(self):
+        func = self.flaky(OperationalError(1213, "Deadlock found"), OperationalError(1213, "Deadlock found"))
+        before = retry_stats().get(("t.deadlock", "deadlock", "retry"), 0)
+
+        self.assertEqual(run_with_retry(func, name="t.deadlock"), "ok")
+        self.assertEqual(func.calls, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(self.signals, [("t.deadlock", "deadlock", "retry", 1), ("t.deadlock", "deadlock", "retry", 2)])
+        self.assertEqual(retry_stats()[("t.deadlock", "deadlock", "retry")] - before, 2)
+
+    def test_gives_up_after_attempts(self):
+        func = self.flaky(*[OperationalError(1213, "Deadlock found")] * 5)
+
+        with self.assertLogs("common.db_retry", "INFO") as logs, self.assertRaises(OperationalError):
+            run_with_retry(func, name="t.gave_up")
+        self.assertEqual(func.calls, 3)
+        self.assertEqual([s[2:] for s in self.signals], [("retry", 1), ("retry", 2), ("gave_up", 3)])
+        self.assertEqual([r.levelname for r in logs.records], ["INFO", "INFO", "WARNING"])
+
+    def test_lock_wait_not_retried_by_default(self):
+        func = self.flaky(OperationalError("database is locked"))
+
+        with self.assertLogs("common.db_retry", "WARNING"), self.assertRaises(OperationalError):
+            run_with_retry(func, name="t.lock_wait")
+        self.assertEqual(func.calls, 1)
+        self.assertEqual(self.signals, [("t.lock_wait", "lock_wait", "gave_up", 1)])
+
+    @override_settings(DB_RETRY_LOCK_WAIT=True)
+    def test_lock_wait_retried_when_enabled(self):
+        func = self.flaky(OperationalError("database is locked"), OperationalError(1205, "Lock wait timeout"))
+
+        self.assertEqual(run_with_retry(func, name="t.lock_wait_on"), "ok")
+        self.assertEqual(func.calls, 3)
+
+    def test_no_retry_inside_outer_atomic(self):
+        func = self.flaky(OperationalError(1213, "Deadlock found"))
+
+        with mock.patch.object(connections["default"], "in_atomic_block", True), self.assertRaises(OperationalError):
+            run_with_retry(func, name="t.atomic")
+        self.assertEqual(func.calls, 1)
+        self.assertEqual(self.signals, [])
+
+    def test_other_operational_error_propagates(self):
+        func = self.flaky(OperationalError(2006, "MySQL server has gone away"))
+
+        with self.assertRaises(OperationalError):
+            run_with_retry(func, name="t.other")
+        self.assertEqual(func.calls, 1)
+        self.sleep.assert_not_called()
+        self.assertEqual(self.signals, [])
+
+    def test_broken_receiver_does_not_break_retry(self):
+        def broken(sender, **kwargs):
+            raise RuntimeError("metrics down")
+        lock_retry.connect(broken, weak=False)
+        self.addCleanup(lock_retry.disconnect, broken)
+        func = self.flaky(OperationalError(1213, "Deadlock found"))
+
+        with self.assertLogs("common.db_retry", "ERROR"):
+            self.assertEqual(run_with_retry(func, name="t.receiver"), "ok")
+
+
+class LockErrorResponseTests(NoThrottleMixin, TestCase):
+    """Lỗi khoá đã hết lượt chạy lại -> 503 + Retry-After, không phải 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="buyer", phone="0900000001")
+        cls.product = Product.objects.create(name="p", price=Decimal("10.00"), stock=5)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, error):
+        with mock.patch("orders.serializers.OrderSerializer._create_items", side_effect=error):
+            return self.client.post(
+                "/api/orders/", {"items": [{"product": self.product.pk, "quantity": 1}]}, format="json"
+            )
+
+    @override_settings(DB_RETRY_AFTER_SECONDS=2)
+    def test_gave_up_maps_to_503(self):
+        for error in (OperationalError(1213, "Deadlock found"), OperationalError(1205, "Lock wait timeout"),
+                      OperationalError("database is locked")):
+            with self.subTest(error=str(error)):
+                resp = self.checkout(error)
+                self.assertEqual(resp.status_code, 503)
+                self.assertEqual(resp["Retry-After"], "2")
+                self.assertIn("detail", resp.json())
+        self.assertFalse(Order.objects.exists())
+
+    def test_other_errors_unchanged(self):
+        self.assertEqual(self.checkout(OperationalError(2006, "MySQL server has gone away")).status_code, 500)
+        self.assertEqual(self.client.get("/api/orders/999999/").status_code, 404)
@@ -1,13 +1,20 @@
+from operator import itemgetter
+
 from django.db import transaction
 from django.db.models import F
+from django.db.models.functions import Greatest
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status as http_status
 
-from .models import Order
-from .serializers import OrderSerializer
+from .models import Order, OrderArchive, OrderEvent
+from .events import record_order_event
+from .serializers import OrderArchiveSerializer, OrderEventSerializer, OrderSerializer, QuoteSerializer
+from .outbox import sequenced_events
 from products.models import Product
+from common.db_retry import retry_on_lock_error
 
 # ALLOWED_TRANSITIONS = {
 #     "pending": {"paid", "cancelled"},
@@ -20,24 +27,149 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.user.is_staff or obj.user_id == request.user.id
 
+class _MergedOrderKeys:
+    """
+    Đơn nóng + archive như 1 list đã sort, cho Paginator (count() + slice). Không UNION: lấy trang
+    [start:stop] thì mỗi bảng chỉ đọc `stop` dòng đầu theo index của nó (ORDER BY ... LIMIT stop),
+    rồi merge trong Python -> không sort cả 2 bảng. Trang càng sâu càng đọc nhiều (như OFFSET).
+    """
+
+    KEYS = ("id", "created_at", "total")
+
+    def __init__(self, hot, cold, ordering):
+        # khoá phụ id cùng chiều khoá chính -> index (x, -id) duyệt được cả 2 chiều, không filesort
+        self.ordering = [*ordering, "-id" if ordering[-1].startswith("-") else "id"]
+        self.branches = [
+            (qs.order_by(*ordering).values(*self.KEYS), archived)
+            for qs, archived in ((hot, False), (cold, True))
+        ]
+
+    def count(self):
+        return sum(qs.count() for qs, _ in self.branches)
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        rows = [{**r, "archived": archived} for qs, archived in self.branches for r in qs[:stop]]
+        for field in reversed(self.ordering):  # sort ổn định: khoá phụ trước, khoá chính sau
+            rows.sort(key=itemgetter(field.lstrip("-")), reverse=field.startswith("-"))
+        return rows[start:stop]
+
+
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
     search_fields = ["note"]
     ordering_fields = ["created_at", "total"]
     filterset_fields = {"status": ["exact"]}
+    throttle_scope = "orders"  # rate riêng cho checkout: "orders.create"
 
     def get_queryset(self):
         qs = Order.objects.select_related("user").prefetch_related("items__product")
         return qs if self.request.user.is_staff else qs.filter(user=self.request.user)
 
+    # ------- archive (?include_archived=1, chỉ list/retrieve) -------
+    def _include_archived(self):
+        return self.request.query_params.get("include_archived") in ("1", "true")
+
+    def get_archive_queryset(self):
+        qs = OrderArchive.objects.select_related("user").prefetch_related("items__product")
+        return qs if self.request.user.is_staff else qs.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if not self._include_archived():
+            return super().list(request, *args, **kwargs)
+
+        hot = self.filter_queryset(self.get_queryset())
+        cold = self.filter_queryset(self.get_archive_queryset())
+        # phân trang trên (id + cột sort) của 2 bảng rồi mới load đúng các đơn của trang
+        merged = _MergedOrderKeys(hot, cold, hot.query.order_by or Order._meta.ordering)
+        page = self.paginate_queryset(merged)
+        rows = page if page is not None else merged[:None]
+
+        hot_objs = self.get_queryset().in_bulk([r["id"] for r in rows if not r["archived"]])
+        cold_objs = self.get_archive_queryset().in_bulk([r["id"] for r in rows if r["archived"]])
+        ctx = self.get_serializer_context()
+        data = [
+            OrderArchiveSerializer(cold_objs[r["id"]], context=ctx).data if r["archived"]
+            else self.get_serializer(hot_objs[r["id"]]).data
+            for r in rows
+        ]
+        return self.get_paginated_response(data) if page is not None else Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self._include_archived():
+            pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            if not self.get_queryset().filter(pk=pk).exists():
+                obj = get_object_or_404(self.get_archive_queryset(), pk=pk)
+                self.check_object_permissions(request, obj)
+                return Response(OrderArchiveSerializer(obj, context=self.get_serializer_context()).data)
+        return super().retrieve(request, *args, **kwargs)
+
+    # ------- báo giá giỏ hàng (không khoá, không ghi) -------
+    @action(detail=False, methods=["post"])
+    def quote(self, request):
+        """
+        Cùng cách tính với checkout nhưng chỉ đọc: client biết trước hết hàng/giá
+        thay vì POST /orders/ rồi bị rollback trên select_for_update.
+        """
+        ser = QuoteSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        return Response(ser.quote())
+
+    # ------- feed thay đổi (thay cho poll cả list) -------
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        ?since=<cursor>&limit=<n>: event sau cursor (seq, thứ tự commit), tăng dần.
+        Gọi lại với since=next_cursor; has_more=false thì đã theo kịp.
+        """
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = int(request.query_params.get("limit", 100))
+        except ValueError:
+            return Response({"detail": "since/limit phải là số"}, status=400)
+        limit = max(1, min(limit, 500))
+        # chỉ đọc: seq được gán sau commit của transaction ghi event (orders.events)
+        qs = sequenced_events(since)
+        if not request.user.is_staff:
+            qs = qs.filter(user_id=request.user.id)
+        events = list(qs[: limit + 1])
+        has_more = len(events) > limit
+        events = events[:limit]
+        return Response({
+            "results": OrderEventSerializer(events, many=True).data,
+            "next_cursor": events[-1].seq if events else since,
+            "has_more": has_more,
+        })
+
+    @retry_on_lock_error
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance = self._lock(instance)
+        if instance.status in Order.STOCK_HOLDING_STATUSES:
+            self._release_all(instance)
+        record_order_event(instance, OrderEvent.TYPE_DELETED)
+        instance.delete()
+
     # ------- helpers -------
+    def _lock(self, order: Order) -> Order:
+        """
+        Khoá dòng Order và đọc lại status trước khi đụng kho: 2 request cancel/refund cùng lúc
+        không trả kho 2 lần. Thứ tự khoá luôn là Order -> Product (theo id).
+        """
+        return get_object_or_404(Order.objects.select_for_update(), pk=order.pk)
+
     def _reserve_all(self, order: Order):
-        for it in order.items.select_related("product"):
-            p = Product.objects.select_for_update().get(pk=it.product_id)
+        items = list(order.items.all())
+        products = (
+            Product.objects.select_for_update().only("id", "name", "stock")
+            .order_by("id").in_bulk([it.product_id for it in items])
+        )
+        for it in items:
+            p = products[it.product_id]
             if p.stock < it.quantity:
                 return f"'{p.name}' thiếu kho (còn {p.stock}, cần {it.quantity})"
-        for it in order.items.all():
+        for it in items:
             Product.objects.filter(pk=it.product_id).update(
                 stock=F("stock") - it.quantity, sold_count=F("sold_count") + it.quantity
             )
@@ -46,45 +178,53 @@ class OrderViewSet(viewsets.ModelViewSet):
     def _release_all(self, order: Order):
         for it in order.items.all():
             Product.objects.filter(pk=it.product_id).update(
-                stock=F("stock") + it.quantity, sold_count=F("sold_count") - it.quantity
+                stock=F("stock") + it.quantity, sold_count=Greatest(F("sold_count") - it.quantity, 0)
             )
 
     # ------- actions -------
     @action(detail=True, methods=["post"])
+    @retry_on_lock_error
+    @transaction.atomic
     def pay(self, request, pk=None):
-        o = self.get_object()
+        o = self._lock(self.get_object())
         if o.status != "pending":
             return Response({"detail": "Chỉ pay từ pending"}, status=400)
         o.status = "paid"; o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_PAID)
         return Response(self.get_serializer(o).data)
 
     @action(detail=True, methods=["post"])
+    @retry_on_lock_error
     @transaction.atomic
     def cancel(self, request, pk=None):
-        o = self.get_object()
+        o = self._lock(self.get_object())
         if o.status not in ("draft","pending"):
             return Response({"detail":"Chỉ hủy từ draft/pending"}, status=400)
         self._release_all(o)
         o.status = "cancelled"; o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_CANCELLED)
         return Response(self.get_serializer(o).data)
 
     @action(detail=True, methods=["post"])
+    @retry_on_lock_error
     @transaction.atomic
     def refund(self, request, pk=None):
-        o = self.get_object()
+        o = self._lock(self.get_object())
         if o.status != "paid":
             return Response({"detail":"Chỉ hoàn tiền đơn đã paid"}, status=400)
         self._release_all(o)
         o.status = "refunded"; o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_REFUNDED)
         return Response(self.get_serializer(o).data, status=http_status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAdminUser])
+    @retry_on_lock_error
     @transaction.atomic
     def reopen(self, request, pk=None):
         """
         cancelled/refunded -> pending (mở lại, giữ kho; fail nếu thiếu).
         """
-        o = self.get_object()
+        o = self._lock(self.get_object())
         if o.status not in ("cancelled", "refunded"):
             return Response({"detail": "Chỉ mở lại đơn đã hủy/đã hoàn tiền"}, status=400)
 
@@ -94,4 +234,5 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         o.status = "pending"
         o.save(update_fields=["status"])
+        record_order_event(o, OrderEvent.TYPE_REOPENED)
         return Response(self.get_serializer(o).data, status=200)
\ No newline at end of file
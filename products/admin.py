@@ -1,8 +1,12 @@
 from django.contrib import admin
 from .models import Product
+from common.paginator import EstimatedCountPaginator
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("id","name","price","stock","sold_count","created_at")
-    search_fields = ("name",)
+    list_display = ("id","sku","name","price","stock","sold_count","created_at")
+    # tìm theo tiền tố -> dùng được index của name/sku
+    search_fields = ("^name","^sku")
     list_editable = ("stock","price","name")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .models import Product
+        from .pricing import invalidate_prices
+        from . import checks  # noqa: F401  (đăng ký system check)
+
+        post_save.connect(invalidate_prices, sender=Product, dispatch_uid="price_snapshot_save")
+        post_delete.connect(invalidate_prices, sender=Product, dispatch_uid="price_snapshot_delete")
+
+        # build lại snapshot catalogue sau mỗi lần sửa sản phẩm (mặc định tắt, dùng cron export_catalogue)
+        if getattr(settings, "CATALOGUE_SNAPSHOT_ON_SAVE", False):
+            from .snapshot import schedule_rebuild
+
+            post_save.connect(schedule_rebuild, sender=Product, dispatch_uid="catalogue_snapshot_save")
+            post_delete.connect(schedule_rebuild, sender=Product, dispatch_uid="catalogue_snapshot_delete")
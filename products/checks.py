@@ -0,0 +1,20 @@
+# products/checks.py
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .pricing import LOCAL_CACHE_BACKENDS
+
+
+@register()
+def price_snapshot_cache(app_configs, **kwargs):
+    """Snapshot giá mà cache chỉ trong process thì đổi giá ở worker này, worker khác không biết."""
+    if not getattr(settings, "PRICE_SNAPSHOT_ENABLED", False):
+        return []
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Error(
+            "PRICE_SNAPSHOT_ENABLED cần cache dùng chung giữa các worker",
+            hint="Đặt REDIS_URL (cache redis) hoặc PRICE_SNAPSHOT_ENABLED=0.",
+            id="products.E001",
+        )]
+    return []
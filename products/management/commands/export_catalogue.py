@@ -0,0 +1,20 @@
+# products/management/commands/export_catalogue.py
+from django.core.management.base import BaseCommand
+
+from products.snapshot import build_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = "Xuất snapshot JSON (nén sẵn) của catalogue cho nginx/CDN."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="thư mục output, mặc định CATALOGUE_SNAPSHOT_DIR")
+        parser.add_argument("--full", action="store_true", help="bỏ qua manifest cũ, build lại toàn bộ")
+
+    def handle(self, *args, **opts):
+        root = opts["dir"] or snapshot_dir()
+        stats = build_snapshot(full=opts["full"], root=root)
+        self.stdout.write(self.style.SUCCESS(
+            f"{root}: version={stats['version']} changed={stats['changed']} "
+            f"removed={stats['removed']} pages={stats['pages']} files={stats['files']}"
+        ))
@@ -0,0 +1,36 @@
+# products/management/commands/sync_products.py
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.sync import CHUNK_SIZE, iter_csv_rows, iter_ndjson_rows, upsert_products
+
+
+class Command(BaseCommand):
+    help = "Đồng bộ sản phẩm từ file ERP (CSV hoặc NDJSON), khớp theo sku."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="mặc định đoán theo đuôi file")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="chỉ tính diff, không ghi DB")
+
+    def handle(self, *args, **opts):
+        path = Path(opts["path"])
+        if not path.is_file():
+            raise CommandError(f"Không thấy file {path}")
+        fmt = opts["format"] or ("csv" if path.suffix.lower() == ".csv" else "ndjson")
+        reader = iter_csv_rows if fmt == "csv" else iter_ndjson_rows
+
+        with path.open(newline="", encoding="utf-8") as fp:
+            result = upsert_products(reader(fp), chunk_size=opts["chunk_size"], dry_run=opts["dry_run"])
+
+        for err in result["errors"][:20]:
+            self.stderr.write(f"dòng {err['line']}: {err['detail']}")
+        if len(result["errors"]) > 20:
+            self.stderr.write(f"... và {len(result['errors']) - 20} lỗi khác")
+        self.stdout.write(self.style.SUCCESS(
+            f"created={result['created']} updated={result['updated']} "
+            f"unchanged={result['unchanged']} errors={len(result['errors'])}"
+            + (" (dry-run)" if opts["dry_run"] else "")
+        ))
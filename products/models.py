@@ -1,6 +1,8 @@
 from django.db import models
 
 class Product(models.Model):
+    # mã hàng bên ERP -> khoá ổn định để đồng bộ hàng loạt (null với sp tạo tay)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200, db_index=True)
     price = models.DecimalField(max_digits=12, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)       
@@ -10,6 +12,10 @@ class Product(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="product_created_idx"),
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+        ]
 
     # def __str__(self):
     #     return self.name
@@ -0,0 +1,106 @@
+# products/pricing.py
+"""
+Snapshot giá sản phẩm trong RAM của process (id -> PriceRow(id, name, price)) cho báo giá giỏ
+hàng (/api/orders/quote/) và bước validate giỏ của checkout, để không phải query MySQL mỗi lần.
+
+Invalidate theo version: mỗi lần Product đổi (post_save/post_delete, hoặc invalidate_prices()
+sau bulk_update như products.sync) thì version trong Django cache tăng; process thấy version khác
+thì bỏ snapshot cũ. Cache phải dùng chung (redis) để mọi worker thấy version mới - check
+products.E001 chặn cấu hình locmem. Ngoài ra mỗi dòng chỉ sống PRICE_SNAPSHOT_MAX_AGE giây
+(chặn trên độ cũ nếu lỡ có đường ghi không bump version, vd QuerySet.update trong shell).
+Chỉ cache giá/tên - tồn kho đổi liên tục nên luôn đọc từ DB. Checkout vẫn lấy giá từ dòng đã khoá.
+Tắt bằng PRICE_SNAPSHOT_ENABLED = False.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Product
+
+PriceRow = namedtuple("PriceRow", ["id", "name", "price"])
+StockedPriceRow = namedtuple("StockedPriceRow", ["id", "name", "price", "stock"])
+
+VERSION_KEY = "products:price_version"
+
+# cache chỉ sống trong process -> version không tới được worker khác
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+_lock = threading.Lock()
+_rows = {}  # id -> (PriceRow, thời điểm nạp)
+_version = None
+
+
+def enabled() -> bool:
+    return getattr(settings, "PRICE_SNAPSHOT_ENABLED", False)
+
+
+def bump_price_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # chưa có key
+        cache.set(VERSION_KEY, 1, None)
+
+
+def invalidate_prices(**kwargs):
+    """Receiver post_save/post_delete của Product. Bump sau commit, tránh process khác nạp lại giá chưa commit."""
+    transaction.on_commit(bump_price_version)
+
+
+def _load(ids):
+    return {
+        p.id: PriceRow(p.id, p.name, p.price)
+        for p in Product.objects.only("id", "name", "price").in_bulk(ids).values()
+    }
+
+
+def get_prices(ids) -> dict:
+    """{id: PriceRow} cho các id còn tồn tại. Id không có trong kết quả = không tồn tại."""
+    global _version
+    ids = set(ids)
+    if not enabled():
+        return _load(ids)
+
+    version = cache.get(VERSION_KEY, 0)
+    max_age = getattr(settings, "PRICE_SNAPSHOT_MAX_AGE", 60)
+    now = time.monotonic()
+    with _lock:
+        if version != _version:
+            _rows.clear()
+            _version = version
+        found = {}
+        for i in ids:
+            entry = _rows.get(i)
+            if entry is not None and now - entry[1] <= max_age:
+                found[i] = entry[0]
+    missing = ids - found.keys()
+    if missing:
+        loaded = _load(missing)
+        with _lock:
+            if _version == version:
+                _rows.update((i, (row, now)) for i, row in loaded.items())
+        found.update(loaded)
+    return found
+
+
+def get_prices_with_stock(ids) -> dict:
+    """
+    {id: StockedPriceRow} cho báo giá: giá/tên từ snapshot, stock luôn đọc DB (1 query theo PK).
+    Snapshot tắt thì đọc cả 4 cột trong 1 query như cũ.
+    """
+    ids = set(ids)
+    if not enabled():
+        return {
+            p.id: StockedPriceRow(p.id, p.name, p.price, p.stock)
+            for p in Product.objects.only("id", "name", "price", "stock").in_bulk(ids).values()
+        }
+    prices = get_prices(ids)
+    stock = dict(Product.objects.filter(id__in=prices).values_list("id", "stock"))
+    # sản phẩm vừa bị xoá sau khi vào snapshot -> coi như không tồn tại
+    return {i: StockedPriceRow(*row, stock[i]) for i, row in prices.items() if i in stock}
@@ -0,0 +1,279 @@
+# products/snapshot.py
+"""
+Xuất catalogue ra file JSON tĩnh để nginx/CDN phục vụ:
+
+    <dir>/manifest.json                      version hiện tại + "path" của bộ list
+    <dir>/v<version>/products.json           toàn bộ list
+    <dir>/v<version>/pages/page-<n>.json     shard giống PageNumberPagination
+    <dir>/items/<id>.json                    từng sản phẩm (luôn là bản mới nhất)
+
+File list (products.json, pages) nằm trong thư mục của version và không bao giờ bị ghi đè: client
+đọc manifest rồi đi theo "path" sẽ thấy đủ các page của cùng 1 version (next/previous là đường
+dẫn tương đối), không lẫn page cũ/mới. Page không đổi được hard link từ version trước. Giữ lại
+KEEP_VERSIONS version gần nhất cho client đang đọc dở, cũ hơn thì xoá.
+
+Shape = ProductSerializer bỏ stock/sold_count: 2 cột này đổi qua QuerySet.update(F(...)) ở mọi
+checkout/cancel/refund mà không chạm updated_at, nên snapshot không theo kịp được; tồn kho thật
+lấy qua API (/api/orders/quote/).
+
+Mỗi file kèm bản .gz (và .br nếu cài brotli). Ghi file tạm rồi os.replace -> atomic.
+Manifest lưu updated_at từng sản phẩm; lần sau chỉ serialize sản phẩm đổi, page/products.json
+ghép lại từ bytes của items/<id>.json đã có trên đĩa (không query/serialize lại cả catalogue).
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product
+from .serializers import ProductSerializer
+
+try:
+    import brotli
+except ImportError:  # brotli là tuỳ chọn
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khoá giữa các process
+    fcntl = None
+
+MANIFEST = "manifest.json"
+SERIALIZE_CHUNK = 1000
+KEEP_VERSIONS = 3
+SUFFIXES = ("", ".gz", ".br")
+
+
+class SnapshotProductSerializer(ProductSerializer):
+    class Meta(ProductSerializer.Meta):
+        fields = None
+        exclude = ("stock", "sold_count")
+
+
+def snapshot_dir() -> Path:
+    return Path(getattr(settings, "CATALOGUE_SNAPSHOT_DIR", settings.BASE_DIR / "snapshots"))
+
+
+def page_size() -> int:
+    return int(getattr(settings, "REST_FRAMEWORK", {}).get("PAGE_SIZE") or 20)
+
+
+# ----------------- Helpers -----------------
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _write_bytes(path: Path, raw: bytes):
+    """Ghi json + bản nén. Trả về số file đã ghi."""
+    _atomic_write(path, raw)
+    # mtime=0 -> cùng nội dung thì cùng bytes, CDN không bị đổi ETag vô cớ
+    _atomic_write(path.with_name(path.name + ".gz"), gzip.compress(raw, compresslevel=9, mtime=0))
+    written = 2
+    if brotli is not None:
+        _atomic_write(path.with_name(path.name + ".br"), brotli.compress(raw))
+        written += 1
+    return written
+
+
+def _remove_json(path: Path):
+    for suffix in SUFFIXES:
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def _link_json(src: Path, dst: Path) -> bool:
+    """Dùng lại file (json + bản nén) của version trước; thiếu file thì trả False để ghi lại."""
+    if not src.exists():
+        return False
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in SUFFIXES:
+        s, d = src.with_name(src.name + suffix), dst.with_name(dst.name + suffix)
+        if not s.exists():
+            continue
+        try:
+            os.link(s, d)
+        except OSError:  # FS không hỗ trợ hard link
+            shutil.copyfile(s, d)
+    return True
+
+
+def _prune_versions(root: Path, keep: set):
+    for d in root.glob("v*"):
+        if d.is_dir() and d.name not in keep and d.name[1:].isdigit():
+            shutil.rmtree(d, ignore_errors=True)
+
+
+def _load_manifest(root: Path) -> dict:
+    try:
+        return json.loads((root / MANIFEST).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextmanager
+def _dir_lock(root: Path):
+    """1 build/thư mục tại 1 thời điểm (cron + hook on-save, nhiều worker)."""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _render_items(ids) -> dict:
+    """{id: bytes JSON} cho các id, serialize theo lô SERIALIZE_CHUNK."""
+    ids = sorted(int(pk) for pk in ids)
+    renderer = JSONRenderer()
+    out = {}
+    for i in range(0, len(ids), SERIALIZE_CHUNK):
+        qs = Product.objects.filter(id__in=ids[i:i + SERIALIZE_CHUNK])
+        for row in SnapshotProductSerializer(qs, many=True).data:
+            out[str(row["id"])] = renderer.render(row)
+    return out
+
+
+def _page_bytes(num, total_pages, count, items) -> bytes:
+    head = json.dumps({
+        "count": count,
+        "next": f"page-{num + 1}.json" if num < total_pages else None,
+        "previous": f"page-{num - 1}.json" if num > 1 else None,
+    }, separators=(",", ":"))
+    return head[:-1].encode() + b',"results":[' + b",".join(items) + b"]}"
+
+
+# ----------------- Build -----------------
+def build_snapshot(full=False, root=None) -> dict:
+    """
+    Build snapshot vào `root` (mặc định settings.CATALOGUE_SNAPSHOT_DIR).
+    full=False: so với manifest cũ, chỉ ghi lại item/shard thay đổi; không đổi gì thì giữ nguyên version.
+    """
+    root = Path(root) if root else snapshot_dir()
+    with _dir_lock(root):
+        return _build(root, full)
+
+
+def _build(root: Path, full: bool) -> dict:
+    previous = _load_manifest(root)
+    prev_items = previous.get("items", {})
+    # full: serialize lại tất cả, nhưng vẫn so với manifest cũ để xoá item đã mất
+    old_items = {} if full else prev_items
+    old_pages = [] if full else previous.get("pages", [])
+
+    # chỉ lấy (id, updated_at) để diff, chưa serialize gì
+    stamps = list(
+        Product.objects.order_by("-created_at", "-id").values_list("id", "updated_at")
+    )
+    items = {str(pk): ts.isoformat() for pk, ts in stamps}
+    changed = {pk for pk, ts in items.items() if old_items.get(pk) != ts}
+
+    # chỉ serialize sản phẩm đổi; sản phẩm bị xoá sau query trên thì không có trong rendered
+    rendered = _render_items(changed)
+    for pk in changed - rendered.keys():
+        del items[pk]
+    changed &= rendered.keys()
+    order = [str(pk) for pk, _ in stamps if str(pk) in items]
+    removed = set(prev_items) - set(items)
+
+    size = page_size()
+    pages = [order[i:i + size] for i in range(0, len(order), size)] or [[]]
+    dirty_pages = [
+        n for n, ids in enumerate(pages)
+        if n >= len(old_pages) or old_pages[n] != ids or changed.intersection(ids)
+    ]
+    stats = {"changed": len(changed), "removed": len(removed), "pages": len(dirty_pages), "files": 0}
+    if not full and previous and not changed and not removed and len(pages) == len(old_pages):
+        stats["version"] = previous.get("version", 0)
+        return stats
+
+    def item_bytes(pk):
+        if pk not in rendered:
+            try:
+                rendered[pk] = (root / "items" / f"{pk}.json").read_bytes()
+            except FileNotFoundError:  # file bị xoá tay -> serialize lại
+                rendered.update(_render_items([pk]))
+                if pk not in rendered:  # vừa bị xoá khỏi DB
+                    return None
+                stats["files"] += _write_bytes(root / "items" / f"{pk}.json", rendered[pk])
+        return rendered[pk]
+
+    def page_items(ids):
+        return [b for b in map(item_bytes, ids) if b is not None]
+
+    for pk in changed:
+        stats["files"] += _write_bytes(root / "items" / f"{pk}.json", rendered[pk])
+    for pk in removed:
+        _remove_json(root / "items" / f"{pk}.json")
+
+    version = previous.get("version", 0) + 1
+    base, old_base = root / f"v{version}", root / previous.get("path", "-")
+    shutil.rmtree(base, ignore_errors=True)  # build trước chết giữa chừng
+    dirty = set(dirty_pages)
+    for n, ids in enumerate(pages):
+        name = f"pages/page-{n + 1}.json"
+        if n in dirty or not _link_json(old_base / name, base / name):
+            stats["files"] += _write_bytes(
+                base / name, _page_bytes(n + 1, len(pages), len(order), page_items(ids))
+            )
+    stats["files"] += _write_bytes(base / "products.json", b"[" + b",".join(page_items(order)) + b"]")
+
+    # manifest ghi cuối cùng: reader thấy version mới thì mọi file đã sẵn sàng
+    _atomic_write(root / MANIFEST, json.dumps({
+        "version": version,
+        "path": base.name,
+        "generated_at": timezone.now().isoformat(),
+        "count": len(order),
+        "page_size": size,
+        "items": items,
+        "pages": pages,
+    }).encode())
+    _prune_versions(root, {f"v{v}" for v in range(version - KEEP_VERSIONS + 1, version + 1)})
+    stats["version"] = version
+    return stats
+
+
+# ----------------- Hook post_save/post_delete (tuỳ chọn) -----------------
+# Build chạy trên 1 thread nền sau CATALOGUE_SNAPSHOT_DEBOUNCE giây, không trong request:
+# mọi lần save trong khoảng đó gộp thành 1 build.
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def _rebuild():
+    global _timer
+    with _timer_lock:
+        _timer = None  # save xảy ra từ đây trở đi sẽ hẹn build mới
+    try:
+        build_snapshot()
+    finally:
+        connection.close()  # connection riêng của thread nền
+
+
+def _schedule():
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(getattr(settings, "CATALOGUE_SNAPSHOT_DEBOUNCE", 5), _rebuild)
+        _timer.daemon = True
+        _timer.start()
+
+
+def schedule_rebuild(**kwargs):
+    """Receiver post_save/post_delete: hẹn build sau commit (rollback thì thôi)."""
+    transaction.on_commit(_schedule)
@@ -0,0 +1,147 @@
+# products/sync.py
+"""Đồng bộ giá/tồn kho hàng loạt từ ERP, khớp sản phẩm theo `sku`."""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Product
+from .pricing import invalidate_prices
+
+SYNC_FIELDS = ("name", "price", "stock")
+CHUNK_SIZE = 1000
+MAX_PRICE = Decimal(10) ** 10      # Product.price: max_digits=12, decimal_places=2
+MAX_STOCK = 2 ** 31 - 1            # PositiveIntegerField trên mọi backend
+SKU_MAX_LENGTH = Product._meta.get_field("sku").max_length
+
+
+# ----------------- Đọc file (stream, không load hết vào RAM) -----------------
+def iter_csv_rows(fp):
+    """CSV có header: sku,name,price,stock."""
+    yield from csv.DictReader(fp)
+
+
+def iter_ndjson_rows(fp):
+    """Mỗi dòng 1 object JSON; bỏ qua dòng trống."""
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# ----------------- Helpers -----------------
+def clean_row(raw) -> dict:
+    """Chuẩn hoá 1 dòng ERP -> dict(sku, name, price, stock). Lỗi thì raise ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError("dòng phải là object")
+    sku = str(raw.get("sku") or "").strip()
+    if not sku:
+        raise ValueError("thiếu sku")
+    # sku dài quá trên MySQL strict -> DataError, rollback cả chunk thay vì báo lỗi 1 dòng
+    if len(sku) > SKU_MAX_LENGTH:
+        raise ValueError(f"sku={sku[:SKU_MAX_LENGTH]}...: sku dài quá {SKU_MAX_LENGTH} ký tự")
+    name = str(raw.get("name") or "").strip()
+    if not name:
+        raise ValueError(f"sku={sku}: thiếu name")
+    try:
+        price = Decimal(str(raw.get("price")))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"sku={sku}: price không hợp lệ")
+    # NaN/Infinity lọt qua Decimal() nhưng so sánh sẽ raise; DecimalField(12, 2) -> tối đa < 10^10
+    if not price.is_finite() or abs(price) >= MAX_PRICE:
+        raise ValueError(f"sku={sku}: price không hợp lệ")
+    if price < 0:
+        raise ValueError(f"sku={sku}: price phải >= 0")
+    price = price.quantize(Decimal("0.01"))
+    try:
+        stock = Decimal(str(raw.get("stock", 0)))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"sku={sku}: stock không hợp lệ")
+    # không làm tròn ngầm 1.7 -> 1
+    if not stock.is_finite() or stock != stock.to_integral_value():
+        raise ValueError(f"sku={sku}: stock phải là số nguyên")
+    if stock < 0:
+        raise ValueError(f"sku={sku}: stock phải >= 0")
+    if stock > MAX_STOCK:
+        raise ValueError(f"sku={sku}: stock quá lớn")
+    stock = int(stock)
+    return {"sku": sku, "name": name[:200], "price": price, "stock": stock}
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        block = list(islice(it, size))
+        if not block:
+            return
+        yield block
+
+
+@transaction.atomic
+def _apply_chunk(rows: dict, dry_run: bool):
+    """rows: {sku: row đã clean}. Trả (created, updated, unchanged)."""
+    # khoá các dòng sẽ ghi (theo id như checkout): bulk_update ghi stock tuyệt đối, đọc không khoá
+    # thì checkout commit xen giữa sẽ bị ghi đè và stock + sold_count lệch
+    existing = (
+        Product.objects.select_for_update().only("id", "sku", *SYNC_FIELDS)
+        .order_by("id").in_bulk(list(rows), field_name="sku")
+    )
+    now = timezone.now()
+    to_create, to_update = [], []
+    for sku, row in rows.items():
+        p = existing.get(sku)
+        if p is None:
+            to_create.append(Product(**row))
+            continue
+        changed = False
+        for f in SYNC_FIELDS:
+            if getattr(p, f) != row[f]:
+                setattr(p, f, row[f])
+                changed = True
+        if changed:
+            # bulk_update không tự set auto_now
+            p.updated_at = now
+            to_update.append(p)
+
+    if not dry_run:
+        if to_create:
+            # sku có thể vừa được tạo bởi request khác -> ghi đè thay vì lỗi unique
+            kwargs = {"update_conflicts": True, "update_fields": [*SYNC_FIELDS, "updated_at"]}
+            if connection.features.supports_update_conflicts_with_target:
+                kwargs["unique_fields"] = ["sku"]
+            Product.objects.bulk_create(to_create, **kwargs)
+        if to_update:
+            Product.objects.bulk_update(to_update, [*SYNC_FIELDS, "updated_at"])
+        if to_create or to_update:
+            invalidate_prices()  # bulk_* không bắn post_save
+    return len(to_create), len(to_update), len(rows) - len(to_create) - len(to_update)
+
+
+# ----------------- Entry point -----------------
+def upsert_products(rows, chunk_size=CHUNK_SIZE, dry_run=False) -> dict:
+    """
+    Upsert theo sku, mỗi chunk 1 transaction. Dòng không đổi thì không ghi gì.
+    Dòng lỗi được bỏ qua và trả về trong "errors" (kèm số dòng, tính từ 1).
+    """
+    result = {"created": 0, "updated": 0, "unchanged": 0, "errors": []}
+    line_no = 0
+    for block in _chunks(rows, chunk_size):
+        cleaned = {}
+        for raw in block:
+            line_no += 1
+            try:
+                row = clean_row(raw)
+            except ValueError as e:
+                result["errors"].append({"line": line_no, "detail": str(e)})
+                continue
+            cleaned[row["sku"]] = row  # trùng sku trong 1 chunk: dòng sau thắng
+        if not cleaned:
+            continue
+        created, updated, unchanged = _apply_chunk(cleaned, dry_run)
+        result["created"] += created
+        result["updated"] += updated
+        result["unchanged"] += unchanged
+    return result
@@ -1,3 +1,214 @@
-from django.test import TestCase
+import json
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from common.query_plan import analyze, plan_problems
+from users.models import User
+from . import snapshot
+from .models import Product
+from .sync import MAX_STOCK, clean_row, upsert_products
+from .views import ProductViewSet
+
+
+class ProductQueryPlanTests(TestCase):
+    """List sản phẩm (API + admin) sort theo price/created_at phải đi theo index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create(
+            [Product(name=f"p{i}", price=Decimal(i % 97), stock=i) for i in range(400)]
+        )
+        cls.staff = User.objects.create(
+            username="staff", phone="0999999999", is_staff=True, is_superuser=True
+        )
+        analyze(Product)
+
+    def api_list_qs(self, params=None):
+        request = Request(APIRequestFactory().get("/api/products/", params or {}))
+        request.user = AnonymousUser()
+        view = ProductViewSet(request=request, format_kwarg=None, action="list", args=(), kwargs={})
+        return view.filter_queryset(view.get_queryset())[:20]
+
+    def assertGoodPlan(self, qs):
+        self.assertEqual(plan_problems(qs), [], msg=str(qs.query))
+
+    def test_list_default(self):
+        self.assertGoodPlan(self.api_list_qs())
+
+    def test_list_ordering(self):
+        for ordering in ("price", "-price", "created_at", "-created_at"):
+            with self.subTest(ordering=ordering):
+                self.assertGoodPlan(self.api_list_qs({"ordering": ordering}))
+
+    def test_admin_changelist(self):
+        request = RequestFactory().get("/admin/products/product/")
+        request.user = self.staff
+        cl = admin.site._registry[Product].get_changelist_instance(request)
+        self.assertGoodPlan(cl.queryset[: cl.list_per_page])
+
+
+class CleanRowTests(SimpleTestCase):
+    def row(self, **kw):
+        return {"sku": "A-1", "name": "Áo", "price": "10", "stock": "3", **kw}
+
+    def test_normalizes(self):
+        self.assertEqual(
+            clean_row(self.row(sku=" A-1 ", price="10.016", stock=3.0)),
+            {"sku": "A-1", "name": "Áo", "price": Decimal("10.02"), "stock": 3},
+        )
+
+    def test_rejects_bad_rows(self):
+        bad = {
+            "không phải dict": ["A-1"],
+            "thiếu sku": self.row(sku=" "),
+            "sku dài": self.row(sku="x" * 65),
+            "thiếu name": self.row(name=""),
+            "price rác": self.row(price="abc"),
+            "price None": self.row(price=None),
+            "price NaN": self.row(price="NaN"),
+            "price Infinity": self.row(price="Infinity"),
+            "price tràn field": self.row(price="1e20"),
+            "price âm": self.row(price="-1"),
+            "stock lẻ": self.row(stock="1.7"),
+            "stock NaN": self.row(stock=float("nan")),
+            "stock âm": self.row(stock=-1),
+            "stock tràn": self.row(stock=MAX_STOCK + 1),
+        }
+        for label, raw in bad.items():
+            with self.subTest(label), self.assertRaises(ValueError):
+                clean_row(raw)
+
+    def test_sku_at_max_length_ok(self):
+        self.assertEqual(clean_row(self.row(sku="x" * 64))["sku"], "x" * 64)
+
+
+class UpsertProductsTests(TestCase):
+    def test_counts_and_unchanged_rows_are_not_written(self):
+        rows = [
+            {"sku": "A", "name": "a", "price": "1", "stock": 1},
+            {"sku": "B", "name": "b", "price": "2", "stock": 2},
+        ]
+        self.assertEqual(upsert_products(rows), {"created": 2, "updated": 0, "unchanged": 0, "errors": []})
+        stamp = Product.objects.get(sku="A").updated_at
+
+        rows[1]["stock"] = 5
+        with self.assertNumQueries(4):  # savepoint, SELECT ... FOR UPDATE, UPDATE B, release
+            result = upsert_products(rows)
+        self.assertEqual(result, {"created": 0, "updated": 1, "unchanged": 1, "errors": []})
+        self.assertEqual(Product.objects.get(sku="A").updated_at, stamp)
+        self.assertEqual(Product.objects.get(sku="B").stock, 5)
+
+        with self.assertNumQueries(3):  # savepoint, SELECT, release: không ghi gì
+            self.assertEqual(upsert_products(rows)["unchanged"], 2)
+
+    def test_bad_lines_reported_without_aborting_chunk(self):
+        rows = [
+            {"sku": "A", "name": "a", "price": "1", "stock": 1},
+            {"sku": "x" * 65, "name": "long", "price": "1", "stock": 1},
+            {"sku": "C", "name": "c", "price": "NaN", "stock": 1},
+        ]
+        result = upsert_products(rows, chunk_size=10)
+        self.assertEqual((result["created"], [e["line"] for e in result["errors"]]), (1, [2, 3]))
+        self.assertTrue(Product.objects.filter(sku="A").exists())
+
+    def test_dry_run_writes_nothing(self):
+        result = upsert_products([{"sku": "A", "name": "a", "price": "1", "stock": 1}], dry_run=True)
+        self.assertEqual(result["created"], 1)
+        self.assertFalse(Product.objects.exists())
+
+
+@override_settings(REST_FRAMEWORK={"PAGE_SIZE": 2})
+class CatalogueSnapshotTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.products = [Product.objects.create(name=f"p{i}", price=Decimal(i + 1), stock=i) for i in range(3)]
+
+    def build(self, full=False):
+        return snapshot.build_snapshot(full=full, root=self.root)
+
+    def manifest(self):
+        return json.loads((self.root / "manifest.json").read_text())
+
+    def listing(self):
+        m = self.manifest()
+        return json.loads((self.root / m["path"] / "products.json").read_text())
+
+    def item_files(self):
+        return sorted(p.name for p in (self.root / "items").iterdir())
+
+    def test_incremental_matches_full(self):
+        self.build()
+        self.products[0].name = "đổi"
+        self.products[0].save()
+        stats = self.build()
+        self.assertEqual((stats["changed"], stats["pages"]), (1, 1))
+        incremental = self.listing()
+
+        self.build(full=True)
+        self.assertEqual(self.listing(), incremental)
+        self.assertEqual(incremental[-1]["name"], "đổi")
+        self.assertNotIn("stock", incremental[0])
+
+    def test_nothing_changed_keeps_version(self):
+        self.assertEqual(self.build()["version"], 1)
+        self.assertEqual(self.build(), {"changed": 0, "removed": 0, "pages": 0, "files": 0, "version": 1})
+
+    def test_deleted_product_files_removed_in_both_modes(self):
+        for full in (False, True):
+            with self.subTest(full=full):
+                self.build()
+                gone = Product.objects.create(name="gone", price=1)
+                self.build()
+                self.assertIn(f"{gone.pk}.json.gz", self.item_files())
+                gone.delete()
+
+                self.assertEqual(self.build(full=full)["removed"], 1)
+                self.assertEqual(self.build()["removed"], 0)
+                self.assertNotIn(f"{gone.pk}.json", self.item_files())
+                self.assertNotIn(f"{gone.pk}.json.gz", self.item_files())
+                self.assertNotIn(gone.pk, [p["id"] for p in self.listing()])
+
+    def test_product_deleted_during_build_is_skipped(self):
+        gone = self.products[1]
+        real = snapshot._render_items
+
+        def render_after_delete(ids):
+            Product.objects.filter(pk=gone.pk).delete()
+            return real(ids)
+
+        with mock.patch.object(snapshot, "_render_items", render_after_delete):
+            self.build()
+        self.assertEqual([p["id"] for p in self.listing()], [self.products[2].pk, self.products[0].pk])
+        self.assertEqual(self.manifest()["count"], 2)
+
+    def test_versions_are_immutable_and_pruned(self):
+        self.build()
+        first = self.root / self.manifest()["path"]
+        page1 = (first / "pages" / "page-1.json").read_bytes()
+        for i in range(snapshot.KEEP_VERSIONS + 1):
+            self.products[2].name = f"v{i}"
+            self.products[2].save()
+            self.build()
+            if i == 0:
+                # version cũ giữ nguyên, page không đổi thì dùng chung file
+                self.assertEqual((first / "pages" / "page-1.json").read_bytes(), page1)
+                current = self.root / self.manifest()["path"]
+                self.assertEqual((current / "pages" / "page-2.json").read_bytes(),
+                                 (first / "pages" / "page-2.json").read_bytes())
+                self.assertNotEqual((current / "pages" / "page-1.json").read_bytes(), page1)
+
+        versions = sorted(p.name for p in self.root.glob("v*"))
+        self.assertEqual(len(versions), snapshot.KEEP_VERSIONS)
+        self.assertFalse(first.exists())
+        page = json.loads((self.root / self.manifest()["path"] / "pages" / "page-1.json").read_text())
+        self.assertEqual((page["count"], page["next"], page["previous"]), (3, "page-2.json", None))
@@ -1,6 +1,7 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, permissions
 from .models import Product
 from .serializers import ProductSerializer,ProductInfoSerializer
+from .sync import upsert_products
 from common.permissions import IsAdminOrReadOnly   
 
 from rest_framework.response import Response          
@@ -27,4 +28,13 @@ class ProductViewSet(viewsets.ModelViewSet):
             "max_price": qs.aggregate(m=Max("price"))["m"],
         }
         ser = ProductInfoSerializer(payload, context={"request": request})
-        return Response(ser.data)
\ No newline at end of file
+        return Response(ser.data)
+
+    # staff đẩy dữ liệu ERP: list [{sku, name, price, stock}, ...] hoặc {"items": [...]}
+    @action(detail=False, methods=["post"], url_path="bulk-upsert", permission_classes=[permissions.IsAdminUser])
+    def bulk_upsert(self, request):
+        rows = request.data.get("items") if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Cần list sản phẩm hoặc {\"items\": [...]}"}, status=400)
+        dry_run = str(request.query_params.get("dry_run", "")).lower() in ("1", "true")
+        return Response(upsert_products(rows, dry_run=dry_run))
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from .availability import remember_user
+        from .models import User
+
+        post_save.connect(remember_user, sender=User, dispatch_uid="register_bloom")
@@ -0,0 +1,168 @@
+# users/availability.py
+"""
+Kiểm tra nhanh username/phone còn trống cho /api/auth/register/check/.
+
+Mỗi process giữ 1 Bloom filter các giá trị đã bị dùng. Full scan users_user chỉ 1 lần/process, trên
+thread nền (chưa xong thì hỏi DB); sau đó mỗi REGISTER_BLOOM_REFRESH giây nạp thêm user có id lớn
+hơn id cuối đã nạp (range scan theo PK). User mới tạo trong process được thêm ngay qua post_save.
+Đăng ký cũng dùng is_available để loại username/phone đã có trước khi hash.
+Bloom nói "chưa có" -> trả available không cần query; nói "có thể có" -> query DB, kết quả
+"đã bị dùng" được cache REGISTER_TAKEN_CACHE_TTL giây.
+Chỉ mang tính gợi ý: user tạo ở process khác có thể chưa vào bloom (chưa tới lượt refresh, commit
+muộn với id nhỏ hơn, đổi username); chốt cuối cùng là unique constraint lúc đăng ký.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import User
+
+FIELDS = ("username", "phone")
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+def _key(field, value):
+    # MySQL collation mặc định không phân biệt hoa thường -> lower() chỉ tăng false positive, không sai
+    return f"{field}:{value.strip().lower()}"
+
+
+_bloom = None
+_capacity = 0       # số user bloom được cỡ cho
+_count = 0          # số user đã thêm
+_last_id = 0        # id lớn nhất đã nạp; refresh đọc id > _last_id
+_refreshed_at = 0.0
+_building = False
+_pending = []  # user tạo trong process lúc đang build, thêm vào bloom mới khi build xong
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+REFRESH_BATCH = 10_000
+
+
+def _add(bloom, username, phone):
+    bloom.add(_key("username", username))
+    bloom.add(_key("phone", phone))
+
+
+def _load():
+    """Full scan users_user: chỉ 1 lần/process, hoặc khi số user vượt capacity của bloom."""
+    global _bloom, _capacity, _count, _last_id, _refreshed_at
+    capacity = max(User.objects.count() * 2, getattr(settings, "REGISTER_BLOOM_CAPACITY", 100_000))
+    bloom = BloomFilter(capacity * len(FIELDS))
+    count = last_id = 0
+    for pk, username, phone in User.objects.order_by("id").values_list("id", *FIELDS).iterator(chunk_size=5000):
+        _add(bloom, username, phone)
+        count, last_id = count + 1, pk
+    with _lock:
+        for key in _pending:
+            bloom.add(key)
+        _pending.clear()
+        _bloom, _capacity, _count, _last_id = bloom, capacity, count, last_id
+        _refreshed_at = time.monotonic()
+
+
+def _build_in_background():
+    global _building
+    try:
+        _load()
+    finally:
+        with _lock:
+            _building = False  # lỗi thì lần gọi sau thử lại
+        connection.close()  # connection riêng của thread nền
+
+
+def _start_build():
+    global _building
+    with _lock:
+        if _building:
+            return
+        _building = True
+    threading.Thread(target=_build_in_background, name="register-bloom", daemon=True).start()
+
+
+def _refresh():
+    """Nạp user mới tạo ở process khác: 1 query theo PK (id > _last_id), thường 0-vài dòng."""
+    global _count, _last_id, _refreshed_at
+    if not _refresh_lock.acquire(blocking=False):
+        return  # thread khác đang refresh
+    try:
+        rows = list(
+            User.objects.filter(id__gt=_last_id).order_by("id")
+            .values_list("id", *FIELDS)[:REFRESH_BATCH]
+        )
+        with _lock:
+            for _, username, phone in rows:
+                _add(_bloom, username, phone)
+            if rows:
+                _last_id = rows[-1][0]
+                _count += len(rows)
+            _refreshed_at = time.monotonic()
+            full = _count > _capacity
+    finally:
+        _refresh_lock.release()
+    if full:  # quá capacity thì false positive tăng -> build lại cỡ lớn hơn, trong lúc đó dùng bloom cũ
+        _start_build()
+
+
+def _get_bloom():
+    """
+    Bloom của process, None khi chưa build xong: lần đầu build trên thread nền, request lúc đó hỏi
+    thẳng DB thay vì chờ full scan. Sau đó mỗi REGISTER_BLOOM_REFRESH giây nạp thêm user mới theo id.
+    """
+    if _bloom is None:
+        _start_build()
+        return None
+    if time.monotonic() - _refreshed_at > getattr(settings, "REGISTER_BLOOM_REFRESH", 30):
+        _refresh()
+    return _bloom
+
+
+def remember_user(sender, instance, created, **kwargs):
+    """post_save của User: thêm ngay vào bloom (hoặc chờ bloom đang build)."""
+    if not created:
+        return
+    keys = [_key(f, getattr(instance, f)) for f in FIELDS]
+    with _lock:
+        if _bloom is not None:
+            for key in keys:
+                _bloom.add(key)
+        if _building:
+            _pending.extend(keys)
+
+
+def is_available(field, value) -> bool:
+    key = _key(field, value)
+    bloom = _get_bloom()
+    if bloom is not None and key not in bloom:
+        return True
+    cache_key = f"register:taken:{key}"
+    if cache.get(cache_key):
+        return False
+    taken = User.objects.filter(**{field: value.strip()}).exists()
+    if taken:
+        cache.set(cache_key, True, getattr(settings, "REGISTER_TAKEN_CACHE_TTL", 60))
+    return not taken
@@ -0,0 +1,31 @@
+# users/backends.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import hash_password, verify_password
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend nhưng hash/verify chạy trên pool của users.hashing, rehash khi login nếu hash cũ."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # vẫn hash 1 lần để thời gian phản hồi không lộ username có tồn tại hay không
+            hash_password(password)
+            return None
+
+        ok, must_update = verify_password(password, user.password)
+        if not ok or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = hash_password(password)
+            user.save(update_fields=["password"])
+        return user
@@ -0,0 +1,29 @@
+# users/hashers.py
+"""
+Hasher chỉnh được tham số qua settings (PASSWORD_ARGON2_*, PASSWORD_SCRYPT_*, PASSWORD_PBKDF2_ITERATIONS).
+Giữ nguyên `algorithm` của Django -> hash cũ vẫn verify được; đổi tham số thì must_update() = True
+và hash được tạo lại lúc user login (xem users.backends).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    time_cost = getattr(settings, "PASSWORD_ARGON2_TIME_COST", Argon2PasswordHasher.time_cost)
+    memory_cost = getattr(settings, "PASSWORD_ARGON2_MEMORY_COST", Argon2PasswordHasher.memory_cost)
+    parallelism = getattr(settings, "PASSWORD_ARGON2_PARALLELISM", Argon2PasswordHasher.parallelism)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = getattr(settings, "PASSWORD_SCRYPT_WORK_FACTOR", ScryptPasswordHasher.work_factor)
+    block_size = getattr(settings, "PASSWORD_SCRYPT_BLOCK_SIZE", ScryptPasswordHasher.block_size)
+    parallelism = getattr(settings, "PASSWORD_SCRYPT_PARALLELISM", ScryptPasswordHasher.parallelism)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = getattr(settings, "PASSWORD_PBKDF2_ITERATIONS", PBKDF2PasswordHasher.iterations)
+
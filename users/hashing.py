@@ -0,0 +1,64 @@
+# users/hashing.py
+"""
+Hash/verify password trên 1 thread pool giới hạn.
+
+hashlib (pbkdf2/scrypt) và argon2-cffi nhả GIL khi tính, nên pool PASSWORD_HASH_WORKERS thread
+chạy song song thật. Số core tối đa = PASSWORD_HASH_WORKERS × PASSWORD_ARGON2_PARALLELISM
+(argon2 chạy mỗi lane trên 1 thread riêng; mặc định parallelism=1 nên = số worker) -> burst
+login/đăng ký không làm đói các thread checkout. Quá PASSWORD_HASH_MAX_PENDING việc đang chờ thì trả 503 ngay.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = 503
+    default_detail = "Hệ thống đang bận, vui lòng thử lại sau."
+    default_code = "hashing_busy"
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _pool():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                workers = getattr(settings, "PASSWORD_HASH_WORKERS", 2)
+                _slots = threading.BoundedSemaphore(getattr(settings, "PASSWORD_HASH_MAX_PENDING", workers * 8))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+    return _executor, _slots
+
+
+def run_in_pool(fn, *args):
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def _verify(raw, encoded):
+    if not check_password(raw, encoded):
+        return False, False
+    preferred = get_hasher("default")
+    hasher = identify_hasher(encoded)
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def hash_password(raw) -> str:
+    return run_in_pool(make_password, raw)
+
+
+def verify_password(raw, encoded):
+    """Trả (đúng password?, cần rehash theo hasher/tham số hiện tại?)."""
+    return run_in_pool(_verify, raw, encoded)
@@ -0,0 +1,52 @@
+# users/management/commands/bench_hashers.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Đo số lần login (verify password) / giây / core cho từng hasher trong PASSWORD_HASHERS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=2.0, help="thời gian đo cho mỗi hasher")
+
+    def handle(self, *args, **opts):
+        password = "correct horse battery staple"
+        self.stdout.write(f"{'hasher':<40} {'params':<32} {'hash ms':>8} {'logins/s/core':>14}")
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as e:  # thiếu thư viện (vd argon2-cffi)
+                self.stdout.write(f"{path:<40} bỏ qua: {e}")
+                continue
+
+            # verify là việc login thực sự làm; argon2 tự chạy `parallelism` thread/lần verify
+            # nên chia cho số thread đó mới ra số login/s trên 1 core
+            n, start = 0, time.perf_counter()
+            while time.perf_counter() - start < opts["seconds"]:
+                hasher.verify(password, encoded)
+                n += 1
+            elapsed = time.perf_counter() - start
+            cores = self._threads(hasher, encoded)
+
+            self.stdout.write(
+                f"{path:<40} {self._params(hasher, encoded):<32} "
+                f"{elapsed / n * 1000:>8.1f} {n / elapsed / cores:>14.1f}"
+            )
+
+    def _threads(self, hasher, encoded):
+        """Số thread 1 lần verify dùng: argon2 = số lane; hashlib (pbkdf2/scrypt) = 1."""
+        params = hasher.decode(encoded).get("params")
+        return max(1, params.parallelism) if params is not None else 1
+
+    def _params(self, hasher, encoded):
+        decoded = hasher.decode(encoded)
+        if "params" in decoded:  # argon2
+            p = decoded["params"]
+            return f"t={p.time_cost} m={p.memory_cost} p={p.parallelism}"
+        if "work_factor" in decoded:  # scrypt
+            return f"N={decoded['work_factor']} r={decoded['block_size']} p={decoded['parallelism']}"
+        return f"iterations={decoded.get('iterations')}"
@@ -1,6 +1,29 @@
 from django.contrib.auth import get_user_model
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from .models import User
+from .availability import is_available
+from .hashing import hash_password
+
+UNIQUE_FIELDS = ("username", "phone")
+
+
+def _unique_message(field):
+    # cùng message với UniqueValidator mà ModelSerializer tự sinh
+    model_field = User._meta.get_field(field)
+    return model_field.error_messages["unique"] % {
+        "model_name": User._meta.verbose_name,
+        "field_label": model_field.verbose_name,
+    }
+
+
+def _violated_fields(err):
+    # MySQL: "Duplicate entry 'x' for key 'users_user.phone'"; SQLite: "UNIQUE constraint failed: users_user.phone"
+    # chỉ xét phần tên key để giá trị nhập vào (vd username "phone1") không làm nhận nhầm
+    msg = str(err)
+    tail = msg.rsplit("for key", 1)[-1] if "for key" in msg else msg.rsplit(":", 1)[-1]
+    return [f for f in UNIQUE_FIELDS if f in tail]
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -9,13 +32,41 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("username", "email", "password","phone")
+        # bỏ UniqueValidator (mỗi field 1 SELECT, vẫn race) -> dựa vào unique constraint khi INSERT
+        extra_kwargs = {
+            "username": {"validators": [UnicodeUsernameValidator()]},
+            "phone": {"validators": []},
+        }
 
     def create(self, validated_data):
-        return User.objects.create_user(
-            username=validated_data["username"],
-            email=validated_data.get("email", ""),
-            password=validated_data["password"],
+        # như create_user nhưng hash trên pool (users.hashing) thay vì request thread
+        user = User(
+            username=User.normalize_username(validated_data["username"]),
+            email=User.objects.normalize_email(validated_data.get("email", "")),
             phone=validated_data["phone"],
         )
+        # loại giá trị đã có TRƯỚC khi hash: bloom nói "chưa có" thì 0 query, còn lại 1 query/field.
+        # Race (vừa bị lấy ở process khác) vẫn do unique constraint bên dưới bắt.
+        taken = [f for f in UNIQUE_FIELDS if not is_available(f, getattr(user, f))]
+        if taken:
+            raise serializers.ValidationError({f: [_unique_message(f)] for f in taken})
+        user.password = hash_password(validated_data["password"])
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError as e:
+            errors = {f: [_unique_message(f)] for f in _violated_fields(e)}
+            if not errors:
+                raise
+            raise serializers.ValidationError(errors)
+        return user
+
 
+class RegisterCheckSerializer(serializers.Serializer):
+    username = serializers.CharField(required=False, max_length=150)
+    phone = serializers.CharField(required=False, max_length=11)
 
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("Cần username hoặc phone")
+        return attrs
@@ -1,3 +1,197 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from common import throttling
+from common.throttling import BucketRateThrottle, LocMemBucketStore, parse_rate
+from . import availability
+from .models import User
+from .serializers import _violated_fields
+
+
+class FreshThrottleStoreMixin:
+    """Store throttle là singleton của process -> mỗi test 1 store mới."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(throttling, "_store", LocMemBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class BucketTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("10/min"), (10, 60))
+        self.assertEqual(parse_rate("5/30s"), (5, 30))
+        self.assertEqual(parse_rate("100/d"), (100, 86400))
+        self.assertIsNone(parse_rate(None))
+
+    @mock.patch("common.throttling.time.monotonic")
+    def test_locmem_bucket_refills(self, monotonic):
+        store = LocMemBucketStore()
+        monotonic.return_value = 1000.0
+        self.assertEqual([store.consume("k", 3, 60)[0] for _ in range(4)], [True, True, True, False])
+        allowed, wait = store.consume("k", 3, 60)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 20.0)
+        self.assertTrue(store.consume("other", 3, 60)[0])  # key khác không ảnh hưởng
+
+        monotonic.return_value = 1020.0  # 1 token / 20s
+        self.assertEqual([store.consume("k", 3, 60)[0] for _ in range(2)], [True, False])
+
+
+class RateLookupTests(SimpleTestCase):
+    def view(self, scope, action=None):
+        return mock.Mock(throttle_scope=scope, action=action, spec=["throttle_scope", "action"])
+
+    @override_settings(REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": {"orders": "120/min", "orders.create": "20/min"}})
+    def test_action_rate_overrides_scope(self):
+        throttle = BucketRateThrottle()
+        self.assertEqual(throttle.get_rate(self.view("orders", "create")), ("orders.create", (20, 60)))
+        self.assertEqual(throttle.get_rate(self.view("orders", "list")), ("orders", (120, 60)))
+        self.assertEqual(throttle.get_rate(self.view("missing", "list")), ("missing", None))
+        self.assertIsNone(throttle.get_rate(self.view(None)))
+
+
+# giữ NUM_PROXIES của settings thật: mặc định phải không tin X-Forwarded-For
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"login": "3/min"}})
+class LoginThrottleTests(FreshThrottleStoreMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def login(self, **extra):
+        return self.client.post(
+            "/api/auth/token/", {"username": "x", "password": "y"}, format="json", **extra
+        ).status_code
+
+    def test_limited_per_ip(self):
+        self.assertEqual([self.login() for _ in range(4)], [401, 401, 401, 429])
+        self.assertEqual(self.login(REMOTE_ADDR="10.0.0.2"), 401)
+
+    def test_spoofed_forwarded_for_does_not_reset_limit(self):
+        codes = [self.login(HTTP_X_FORWARDED_FOR=f"1.2.3.{i}") for i in range(5)]
+        self.assertEqual(codes, [401, 401, 401, 429, 429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1, "DEFAULT_THROTTLE_RATES": {"login": "3/min"}})
+    def test_forwarded_for_used_behind_proxy(self):
+        # proxy thêm IP thật vào cuối; phần client tự gửi phía trước bị bỏ qua
+        codes = [self.login(HTTP_X_FORWARDED_FOR=f"6.6.6.{i}, 9.9.9.9") for i in range(4)]
+        self.assertEqual(codes, [401, 401, 401, 429])
+        self.assertEqual(self.login(HTTP_X_FORWARDED_FOR="9.9.9.8"), 401)
+
+
+class FreshBloomMixin:
+    """Bloom là state của process -> mỗi test bắt đầu như process mới; build không chạy thread thật."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # cache "đã bị dùng" của test trước
+        patcher = mock.patch.multiple(
+            availability, _bloom=None, _capacity=0, _count=0, _last_id=0,
+            _refreshed_at=0.0, _building=False, _pending=[],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        thread = mock.patch.object(availability.threading, "Thread")
+        self.thread = thread.start()
+        self.addCleanup(thread.stop)
+
+
+class AvailabilityTests(FreshBloomMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(username="taken", phone="0900000001")
+
+    def test_first_call_asks_db_while_bloom_builds_in_background(self):
+        with self.assertNumQueries(2):
+            self.assertFalse(availability.is_available("username", "taken"))
+            self.assertTrue(availability.is_available("username", "free"))
+        self.assertEqual(self.thread.call_count, 1)  # build thứ 2 không được hẹn
+
+    def test_bloom_answers_free_values_without_query(self):
+        availability._load()
+        with self.assertNumQueries(0):
+            self.assertTrue(availability.is_available("username", "free"))
+            self.assertTrue(availability.is_available("phone", "0911111111"))
+        with self.assertNumQueries(1):
+            self.assertFalse(availability.is_available("username", " taken "))
+        self.thread.assert_not_called()
+
+    def test_refresh_loads_only_new_ids(self):
+        availability._load()
+        User.objects.create(username="mine", phone="0900000002")  # post_save -> vào bloom ngay
+        # process khác tạo (không qua post_save của process này)
+        User.objects.bulk_create([User(username="elsewhere", phone="0900000003")])
+        with self.assertNumQueries(0):
+            self.assertTrue(availability.is_available("username", "elsewhere"))  # chưa tới lượt refresh
+
+        availability._refreshed_at = 0.0
+        with self.assertNumQueries(2) as ctx:  # refresh theo id + exists
+            self.assertFalse(availability.is_available("username", "elsewhere"))
+        self.assertIn("> %d" % User.objects.get(username="taken").pk, ctx.captured_queries[0]["sql"])
+        self.assertEqual(availability._last_id, User.objects.get(username="elsewhere").pk)
+        with self.assertNumQueries(1):
+            self.assertFalse(availability.is_available("username", "mine"))
+
+    @override_settings(REGISTER_BLOOM_CAPACITY=1)
+    def test_rebuild_when_capacity_exceeded(self):
+        availability._load()
+        User.objects.bulk_create([User(username=f"n{i}", phone=f"09100000{i:02d}") for i in range(3)])
+        availability._refreshed_at = 0.0
+        availability.is_available("username", "x")
+        self.assertEqual(self.thread.call_count, 1)
+
+
+class RegisterTests(FreshBloomMixin, FreshThrottleStoreMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(username="taken", phone="0900000001")
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def register(self, **kw):
+        data = {"username": "new", "phone": "0900000009", "password": "secret", **kw}
+        return self.client.post("/api/auth/register/", data, format="json")
+
+    def test_violated_fields(self):
+        cases = {
+            "Duplicate entry 'x' for key 'users_user.phone'": ["phone"],
+            "(1062, \"Duplicate entry 'phone1' for key 'users_user.username'\")": ["username"],
+            "UNIQUE constraint failed: users_user.username": ["username"],
+            "NOT NULL constraint failed: users_user.email": [],
+        }
+        for msg, fields in cases.items():
+            with self.subTest(msg):
+                self.assertEqual(_violated_fields(IntegrityError(msg)), fields)
+
+    def test_taken_rejected_before_hashing(self):
+        with mock.patch("users.serializers.hash_password") as hash_password:
+            resp = self.register(username="taken", phone="0900000001")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(set(resp.json()), {"username", "phone"})
+        hash_password.assert_not_called()
+
+    def test_unique_race_maps_to_field_error(self):
+        # giá trị vừa bị process khác lấy: pre-check nói trống, INSERT đụng unique constraint
+        with mock.patch("users.serializers.is_available", return_value=True):
+            resp = self.register(phone="0900000001")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(list(resp.json()), ["phone"])
+        self.assertFalse(User.objects.filter(username="new").exists())
+
+    def test_register_ok(self):
+        self.assertEqual(self.register().status_code, 201)
+        self.assertTrue(User.objects.get(username="new").check_password("secret"))
+
+    def test_register_check(self):
+        resp = self.client.get("/api/auth/register/check/", {"username": "taken", "phone": "0999999999"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"username": False, "phone": True})
+        self.assertEqual(self.client.get("/api/auth/register/check/").status_code, 400)
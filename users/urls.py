@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import RegisterView
+from .views import RegisterView, RegisterCheckView
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
+    path("register/check/", RegisterCheckView.as_view(), name="register_check"),
 ]
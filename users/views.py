@@ -1,8 +1,32 @@
 from rest_framework import generics, permissions
-from .serializers import RegisterSerializer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView
+from common.throttling import IPBucketRateThrottle
+from .serializers import RegisterSerializer, RegisterCheckSerializer
+from .availability import is_available
 from .models import User
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [IPBucketRateThrottle]
+    throttle_scope = "register"
+
+class RegisterCheckView(APIView):
+    """GET ?username=..&phone=.. -> {"username": true/false, ...} (true = còn trống)."""
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [IPBucketRateThrottle]
+    throttle_scope = "register_check"
+
+    def get(self, request):
+        ser = RegisterCheckSerializer(data=request.query_params)
+        ser.is_valid(raise_exception=True)
+        return Response({f: is_available(f, v) for f, v in ser.validated_data.items()})
+
+class TokenObtainView(TokenObtainPairView):
+    # chặn brute-force/bot trước khi tới bước hash password
+    throttle_classes = [IPBucketRateThrottle]
+    throttle_scope = "login"